@@ -1,10 +1,17 @@
-import sqlite3 as sql
-import csv
-import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
+import contextvars
 import os
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+from concurrent.futures import CancelledError, Future
 
-USER_DB = "user_management.db"
+from core import (BACKUP_INTERVAL_MS, CHECKPOINT_INTERVAL_MS, DB, FILTER_OPS, PAGE_SIZE, STORAGE_PROFILES,
+                  WAL_MODE, USER_PAGE_SIZE, add_permission, backup_db, clear_permission_cache, create_user,
+                  current_screen, db_summary, filter_clause, get_db_users, get_user_dbs, init_user_db, is_blob,
+                  list_backups, login, page_cache, pool, restore_db, revoke_all_permissions,
+                  revoke_permission, search_users, set_profile, tracer)
 
 # Simplified styling
 BG_DARK = '#2c3e50'
@@ -13,150 +20,232 @@ BTN_PRIMARY = '#3498db'
 BTN_SUCCESS = '#27ae60'
 BTN_DANGER = '#e74c3c'
 
+# Table view
+WINDOW_PAGES = 3     # pages kept in the Treeview at once
+INDEX_SUGGEST_AFTER = 3  # filter/sort uses of an unindexed column before offering an index
+WORKER_POLL_MS = 30  # how often Tk picks up finished background jobs
+STATS_REFRESH_MS = 1000  # diagnostics window refresh
+DASHBOARD_BATCH = 25  # database rows built per slice of the Tk event loop
+
+
+class Worker:
+    """Runs database jobs one at a time on a background thread"""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = queue.SimpleQueue()
+        self.pending = set()
+        self.running = None  # (future, path) of the job in progress
+        threading.Thread(target=self.loop, name='db-worker', daemon=True).start()
+
+    def submit(self, fn, *args, path=None, callback=None, errback=None):
+        """Queue fn(*args); drain() later calls callback(result) or errback(exc)"""
+        future = Future()
+        self.pending.add(future)
+        context = contextvars.copy_context()  # carries the current screen into the traces
+        self.jobs.put((future, context, fn, args, path, callback, errback))
+        return future
+
+    def loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, context, fn, args, path, callback, errback = job
+            if future.set_running_or_notify_cancel():
+                self.running = (future, path)
+                try:
+                    future.set_result(context.run(fn, *args))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    self.running = None
+            self.results.put((future, callback, errback))
+
+    def drain(self):
+        """Run callbacks of finished jobs; call this from the thread that owns the UI"""
+        while True:
+            try:
+                future, callback, errback = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.pending.discard(future)
+            if future.cancelled():
+                exc = CancelledError()
+            else:
+                exc = future.exception()
+            if exc is not None:
+                if errback:
+                    errback(exc)
+            elif callback:
+                callback(future.result())
+
+    def cancel(self, future=None):
+        """Cancel a queued job or interrupt it if running; cancel everything if future is None"""
+        for f in ([future] if future else list(self.pending)):
+            f.cancel()
+        running = self.running
+        if running and running[1] and (future is None or running[0] is future):
+            pool.interrupt(running[1])
+
+    def stop(self):
+        self.jobs.put(None)
+
+class PagedTree:
+    """Keeps a bounded window of table rows in a Treeview, paging on scroll"""
+
+    def __init__(self, tree, scrollbar, fetch, key_len=1):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch = fetch  # fetch(done, failed, after=..., before=...) later calls done([(*sort, *key, *values)])
+        #                     or failed() if the page could not be loaded (error or cancelled)
+        self.key_len = key_len
+        self.sort_len = 0  # leading sort values in each row, set before load()
+        self.keys = {}  # iid -> key tuple
+        self.cursors = {}  # iid -> (*sort, *key) tuple used for paging
+        self.dirty = {}  # key tuple -> {col: value} of unsaved edits, kept across paging
+        self.generation = 0  # bumped by load() so stale pages are ignored
+        self.at_start = True
+        self.at_end = False
+        self.pending = True  # no paging until the first page is in
+        tree.configure(yscrollcommand=self.on_scroll)
+
+    def load(self, after=None, select=None):
+        """(Re)load the first page, or the page following cursor `after` with row `select` selected"""
+        self.generation += 1
+        self.pending = True
+        self.request(lambda rows: self.reload(rows, after is None, select), after=after)
+
+    def request(self, handler, **cursor):
+        generation = self.generation
+
+        def done(rows):
+            if generation == self.generation:
+                handler(rows)
+
+        def failed():
+            if generation == self.generation:
+                self.pending = False  # let the next scroll or load try again
+
+        self.fetch(done, failed, **cursor)
+
+    def reload(self, rows, at_start=True, select=None):
+        self.tree.delete(*self.tree.get_children())
+        self.keys.clear()
+        self.cursors.clear()
+        self.at_start = at_start
+        self.append(rows)
+        if select is not None and self.tree.exists(select):
+            self.tree.selection_set(select)
+            self.tree.see(select)
+
+    def first_cursor(self):
+        items = self.tree.get_children()
+        return self.cursors[items[0]] if items else None
+
+    def last_cursor(self):
+        items = self.tree.get_children()
+        return self.cursors[items[-1]] if items else None
+
+    def selected_keys(self):
+        return [self.keys[item] for item in self.tree.selection()]
+
+    def remove(self, items):
+        self.tree.delete(*items)
+        for item in items:
+            del self.keys[item]
+            del self.cursors[item]
+
+    def delete(self, items):
+        """Remove deleted rows, dropping their unsaved edits"""
+        for item in items:
+            self.dirty.pop(self.keys[item], None)
+        self.remove(items)
+
+    def insert(self, index, row):
+        size = self.sort_len + self.key_len
+        key = tuple(row[self.sort_len:size])
+        iid = repr(key)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)  # moved since it was paged in, e.g. its sort value was edited
+        self.keys[iid] = key
+        self.cursors[iid] = tuple(row[:size])
+        values, tags = self.shown(key, row[size:])
+        self.tree.insert('', index, iid=iid, values=values, tags=tags)
+
+    def shown(self, key, values):
+        """Values and tags to display for a fetched row, with its unsaved edits applied"""
+        edits = self.dirty.get(key)
+        if not edits:
+            return values, ()
+        values = list(values)
+        columns = self.tree['columns']
+        for col, value in edits.items():
+            values[columns.index(col)] = value
+        return values, ('dirty',)
+
+    def edit(self, iid, col, value):
+        """Show an unsaved cell edit and remember it until saved"""
+        self.dirty.setdefault(self.keys[iid], {})[col] = value
+        self.tree.set(iid, col, value)
+        self.tree.item(iid, tags=('dirty',))
+
+    def refresh(self, rows):
+        """Replace rows that are in the window with fresh copies (same shape as fetched pages)"""
+        size = self.sort_len + self.key_len
+        for row in rows:
+            key = tuple(row[self.sort_len:size])
+            iid = repr(key)
+            if self.tree.exists(iid):
+                self.cursors[iid] = tuple(row[:size])
+                values, tags = self.shown(key, row[size:])
+                self.tree.item(iid, values=values, tags=tags)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.pending:
+            return
+        if not self.keys:
+            if not self.at_end:
+                self.load()
+            return
+        if float(last) > 0.9 and not self.at_end:
+            self.pending = True
+            self.request(self.append, after=self.last_cursor())
+        elif float(first) < 0.1 and not self.at_start:
+            self.pending = True
+            self.request(self.prepend, before=self.first_cursor())
+
+    def append(self, rows):
+        self.pending = False
+        with tracer.span('treeview', len(rows)):
+            for row in rows:
+                self.insert(tk.END, row)
+        self.at_end = len(rows) < PAGE_SIZE
+        items = self.tree.get_children()
+        excess = len(items) - WINDOW_PAGES * PAGE_SIZE
+        if excess > 0:
+            top = self.tree.yview()[0] * len(items)
+            self.remove(items[:excess])
+            self.at_start = False
+            self.tree.yview_moveto(max(top - excess, 0) / (len(items) - excess))
+
+    def prepend(self, rows):
+        self.pending = False
+        top = self.tree.yview()[0] * len(self.tree.get_children())
+        with tracer.span('treeview', len(rows)):
+            for row in reversed(rows):
+                self.insert(0, row)
+        self.at_start = len(rows) < PAGE_SIZE
+        items = self.tree.get_children()
+        excess = len(items) - WINDOW_PAGES * PAGE_SIZE
+        if excess > 0:
+            self.remove(items[-excess:])
+            self.at_end = False
+            items = items[:-excess]
+        if items:
+            self.tree.yview_moveto((top + len(rows)) / len(items))
 
-def init_user_db():
-    """Initialize user database"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (
-                     username TEXT PRIMARY KEY,
-                     password TEXT NOT NULL
-                 )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS permissions
-                 (
-                     id         INTEGER PRIMARY KEY AUTOINCREMENT,
-                     db_name    TEXT,
-                     username   TEXT,
-                     created_by TEXT,
-                     UNIQUE (db_name, username)
-                 )''')
-    c.execute("INSERT OR IGNORE INTO users VALUES (?, ?)", ("admin", "test"))
-    conn.commit()
-    conn.close()
-
-
-def login(username, password):
-    """Check login credentials"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    conn.close()
-    return result and result[0] == password
-
-
-def create_user(username, password):
-    """Create new user"""
-    try:
-        conn = sql.connect(USER_DB)
-        c = conn.cursor()
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
-        conn.close()
-        return True
-    except sql.IntegrityError:
-        return False
-
-
-def get_user_dbs(username):
-    """Get databases user can access"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute("SELECT db_name, created_by FROM permissions WHERE username = ?", (username,))
-    dbs = [{"name": row[0], "creator": row[1]} for row in c.fetchall()]
-    conn.close()
-    return dbs
-
-
-def add_permission(db_name, username, created_by):
-    """Grant database access to user"""
-    try:
-        conn = sql.connect(USER_DB)
-        c = conn.cursor()
-        c.execute("INSERT INTO permissions (db_name, username, created_by) VALUES (?, ?, ?)",
-                  (db_name, username, created_by))
-        conn.commit()
-        conn.close()
-        return True
-    except sql.IntegrityError:
-        return False
-
-
-def get_all_users():
-    """Get all usernames"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute("SELECT username FROM users")
-    users = [row[0] for row in c.fetchall()]
-    conn.close()
-    return users
-
-
-def get_db_users(db_name):
-    """Get users with access to database"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute("SELECT username FROM permissions WHERE db_name = ?", (db_name,))
-    users = [row[0] for row in c.fetchall()]
-    conn.close()
-    return users
-
-
-def revoke_permission(db_name, username):
-    """Remove user access"""
-    conn = sql.connect(USER_DB)
-    c = conn.cursor()
-    c.execute("DELETE FROM permissions WHERE db_name = ? AND username = ?", (db_name, username))
-    conn.commit()
-    conn.close()
-
-
-class DB:
-    """Database wrapper"""
-
-    def __init__(self, name):
-        self.conn = sql.connect(name + '.db')
-        self.c = self.conn.cursor()
-
-    def create_table(self, table, cols):
-        col_str = ', '.join([f"{col} {dtype}" for col, dtype in cols.items()])
-        self.c.execute(f"CREATE TABLE IF NOT EXISTS {table} ({col_str})")
-        self.conn.commit()
-
-    def insert(self, table, data):
-        cols = ', '.join([f'"{col}"' for col in data.keys()])
-        vals = ', '.join(['?' for _ in data])
-        self.c.execute(f"INSERT INTO {table} ({cols}) VALUES ({vals})", tuple(data.values()))
-        self.conn.commit()
-
-    def fetch_all(self, table):
-        self.c.execute(f"SELECT * FROM {table}")
-        return self.c.fetchall()
-
-    def get_columns(self, table):
-        self.c.execute(f"PRAGMA table_info({table})")
-        return [col[1] for col in self.c.fetchall()]
-
-    def get_tables(self):
-        self.c.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        return [row[0] for row in self.c.fetchall()]
-
-    def drop_table(self, table):
-        self.c.execute(f"DROP TABLE IF EXISTS {table}")
-        self.conn.commit()
-
-    def export_csv(self, table):
-        self.c.execute(f"SELECT * FROM {table}")
-        rows = self.c.fetchall()
-        cols = [desc[0] for desc in self.c.description]
-        with open(f"{table}.csv", 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(cols)
-            writer.writerows(rows)
-
-    def close(self):
-        self.conn.close()
 
 class App:
     def __init__(self):
@@ -166,26 +255,257 @@ class App:
         self.root.configure(bg=BG_LIGHT)
         self.user = None
         self.current_db = None
+        self.screen = 0  # bumped on every navigation so stale job results are dropped
+        self.worker = Worker()
+        self.busy = {}  # future -> busy message
+        self.busy_frame = None
+        self.column_usage = {}  # (db, table, col) -> filter/sort count
+        self.index_declined = set()
+        self.stats_win = None
+        self.backup_thread = None  # backups and restores run here, not on the worker
+        self.dashboard = None  # dashboard widgets, hidden rather than destroyed on navigation
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        self.poll_worker()
+        if WAL_MODE:
+            self.root.after(CHECKPOINT_INTERVAL_MS, self.checkpoint)
+        self.root.after(BACKUP_INTERVAL_MS, self.scheduled_backups)
 
     def run(self):
         self.root.mainloop()
 
+    def quit(self):
+        self.worker.cancel()
+        self.worker.stop()
+        self.root.destroy()
+
+    def poll_worker(self):
+        self.worker.drain()
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+
+    def checkpoint(self):
+        self.run_bg(pool.checkpoint, errback=lambda e: None, busy=None)
+        self.root.after(CHECKPOINT_INTERVAL_MS, self.checkpoint)
+
+    def scheduled_backups(self):
+        """Snapshot the user's own databases whose newest backup is older than BACKUP_INTERVAL_MS"""
+        self.root.after(BACKUP_INTERVAL_MS, self.scheduled_backups)
+        if not self.user:
+            return
+        due = []
+        max_age = BACKUP_INTERVAL_MS / 1000 * 0.9  # the newest snapshot finished just after the last tick
+        for db in get_user_dbs(self.user):
+            backups = list_backups(db['name'])
+            if db['creator'] == self.user and (not backups or time.time() - backups[0][2] >= max_age):
+                due.append(db['name'])
+
+        def back_up():
+            for name in due:
+                try:
+                    backup_db(name)
+                except Exception:
+                    pass  # e.g. its file was deleted; still back up the others, retry on the next tick
+
+        if due:
+            self.run_thread(back_up, errback=lambda e: None)
+
+    def run_thread(self, fn, callback=None, errback=None):
+        """Run a long job (backup, restore) on its own thread so the worker stays free
+
+        Only one such job runs at a time; returns False if one is already running.
+        """
+        if self.backup_thread is not None and self.backup_thread.is_alive():
+            return False
+        state = {}
+
+        def work():
+            try:
+                state['result'] = fn()
+            except Exception as e:
+                state['error'] = e
+
+        def poll():
+            if self.backup_thread.is_alive():
+                self.root.after(100, poll)
+            elif 'error' in state:
+                if errback:
+                    errback(state['error'])
+                else:
+                    messagebox.showerror("Error", str(state['error']))
+            elif callback:
+                callback(state['result'])
+
+        self.backup_thread = threading.Thread(target=work, name='backup', daemon=True)
+        self.backup_thread.start()
+        poll()
+        return True
+
+    def run_bg(self, fn, *args, callback=None, errback=None, reset=None, busy="Working...", path=None):
+        """Run fn(*args) on the worker and hand the result to callback on the Tk thread
+
+        reset() is called when the job fails for any reason, including being
+        cancelled, before errback or the error message.
+        """
+        screen = self.screen
+
+        def finish():
+            self.busy.pop(future, None)
+            self.update_busy()
+            return screen == self.screen
+
+        def done(result):
+            if finish() and callback:
+                callback(result)
+
+        def failed(exc):
+            current = finish()
+            if reset and current:
+                reset()
+            if isinstance(exc, CancelledError) or str(exc) == 'interrupted':
+                return
+            if errback:
+                if current:
+                    errback(exc)
+            else:
+                messagebox.showerror("Error", str(exc))
+
+        future = self.worker.submit(fn, *args, path=path, callback=done, errback=failed)
+        if busy:
+            self.busy[future] = busy
+            self.update_busy()
+        return future
+
+    def run_db(self, fn, callback=None, **kwargs):
+        """run_bg fn(db) against the current database"""
+        name = self.current_db
+
+        def job():
+            db = DB(name)
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+        return self.run_bg(job, callback=callback, path=name + '.db', **kwargs)
+
+    def update_busy(self):
+        """Show or hide the busy indicator in the header"""
+        if self.busy_frame is None or not self.busy_frame.winfo_exists():
+            return
+        if self.busy:
+            self.busy_label.config(text=list(self.busy.values())[-1])
+            self.busy_frame.place(relx=1.0, rely=0.5, anchor='e', x=-10)
+        else:
+            self.busy_frame.place_forget()
+
     def clear(self):
+        self.screen += 1
         for widget in self.root.winfo_children():
-            widget.destroy()
+            if self.dashboard is not None and widget is self.dashboard['frame']:
+                widget.pack_forget()
+            else:
+                widget.destroy()
 
     def btn(self, parent, text, cmd, color=BTN_PRIMARY):
         """Create styled button"""
         return tk.Button(parent, text=text, command=cmd, bg=color, fg='white',
                          font=('Arial', 10), relief='flat', padx=12, pady=6)
 
-    def header(self, text):
+    def header(self, text, parent=None):
         """Create header"""
-        h = tk.Frame(self.root, bg=BG_DARK, height=60)
+        current_screen.set(text)
+        h = tk.Frame(parent or self.root, bg=BG_DARK, height=60)
         h.pack(fill=tk.X)
         tk.Label(h, text=text, font=('Arial', 16, 'bold'), fg='white', bg=BG_DARK).pack(pady=15)
+        self.btn(h, "Stats", self.diagnostics).place(relx=0.0, rely=0.5, anchor='w', x=10)
+
+        self.busy_frame = tk.Frame(h, bg=BG_DARK)
+        self.busy_label = tk.Label(self.busy_frame, text="", font=('Arial', 9), fg='white', bg=BG_DARK)
+        self.busy_label.pack(side=tk.LEFT, padx=5)
+        bar = ttk.Progressbar(self.busy_frame, mode='indeterminate', length=60)
+        bar.pack(side=tk.LEFT, padx=5)
+        bar.start(15)
+        self.btn(self.busy_frame, "Cancel", self.worker.cancel, BTN_DANGER).pack(side=tk.LEFT, padx=5)
+        self.update_busy()
         return h
 
+    def diagnostics(self):
+        """Window with query latencies per operation, slow queries and connection counts"""
+        if self.stats_win is not None and self.stats_win.winfo_exists():
+            self.stats_win.lift()
+            return
+        win = self.stats_win = tk.Toplevel(self.root)
+        win.title("Diagnostics")
+        win.geometry("700x500")
+        win.configure(bg=BG_LIGHT)
+
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        conns_label = tk.Label(frame, text="", font=('Arial', 10), bg='white')
+        conns_label.pack(anchor='w')
+        cache_label = tk.Label(frame, text="", font=('Arial', 10), bg='white')
+        cache_label.pack(anchor='w')
+
+        cols = ('operation', 'calls', 'rows', 'p50 ms', 'p95 ms', 'max ms')
+        ops = ttk.Treeview(frame, columns=cols, show='headings', height=10)
+        for col in cols:
+            ops.heading(col, text=col)
+            ops.column(col, width=140 if col == 'operation' else 70, anchor='w' if col == 'operation' else 'e')
+        ops.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        tk.Label(frame, text="Slow queries", font=('Arial', 10, 'bold'), bg='white').pack(anchor='w')
+        slow_cols = ('time', 'ms', 'screen', 'operation', 'query')
+        slow = ttk.Treeview(frame, columns=slow_cols, show='headings', height=6)
+        for col, width in zip(slow_cols, (70, 60, 120, 100, 300)):
+            slow.heading(col, text=col)
+            slow.column(col, width=width)
+        slow.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        bar = tk.Frame(frame, bg='white')
+        bar.pack(fill=tk.X, pady=5)
+        tk.Label(bar, text="Slow query threshold (ms):", bg='white').pack(side=tk.LEFT)
+        threshold = tk.StringVar(value=str(tracer.slow_ms))
+        threshold_ent = tk.Entry(bar, textvariable=threshold, width=6)
+        threshold_ent.pack(side=tk.LEFT, padx=5)
+        explain_var = tk.BooleanVar(value=tracer.explain)
+        tk.Checkbutton(bar, text="Log query plans", variable=explain_var, bg='white',
+                       command=lambda: setattr(tracer, 'explain', explain_var.get())).pack(side=tk.LEFT, padx=5)
+
+        def set_threshold(_=None):
+            try:
+                tracer.slow_ms = float(threshold.get())
+            except ValueError:
+                threshold.set(str(tracer.slow_ms))
+
+        threshold_ent.bind('<Return>', set_threshold)
+        threshold_ent.bind('<FocusOut>', set_threshold)
+        self.btn(bar, "Reset", lambda: (tracer.clear(), refresh(False))).pack(side=tk.RIGHT)
+
+        def refresh(repeat=True):
+            if not win.winfo_exists():
+                return
+            conns_label.config(text=f"Connections opened: {tracer.connections()} in the last minute, "
+                                    f"{tracer.connects_total} total, {len(pool.conns)} open")
+            lookups = page_cache.hits + page_cache.misses
+            cache_label.config(text=f"Page cache: {len(page_cache.pages)} pages, "
+                                    f"{page_cache.size / 1048576:.1f} of {page_cache.max_bytes / 1048576:.0f} MB, "
+                                    f"{page_cache.hits / lookups if lookups else 0:.0%} hits")
+            ops.delete(*ops.get_children())
+            stats = tracer.stats()
+            for op in sorted(stats, key=lambda op: -stats[op]['p95']):
+                st = stats[op]
+                ops.insert('', tk.END, values=(op, st['calls'], st['rows'], f"{st['p50'] * 1000:.2f}",
+                                               f"{st['p95'] * 1000:.2f}", f"{st['max'] * 1000:.2f}"))
+            slow.delete(*slow.get_children())
+            for trace in reversed(tracer.slow):
+                slow.insert('', tk.END, values=(time.strftime('%H:%M:%S', time.localtime(trace.started)),
+                                                f"{trace.seconds * 1000:.1f}", trace.screen or '',
+                                                trace.op, ' '.join((trace.query or '').split())))
+            if repeat:
+                win.after(STATS_REFRESH_MS, refresh)
+
+        refresh()
+
     def login_screen(self):
         self.clear()
         self.header("Database Management System")
@@ -265,131 +585,320 @@ class App:
         self.btn(btn_frame, "Back", self.login_screen).pack(side=tk.LEFT, padx=5)
 
     def db_screen(self):
-        self.clear()
-        self.header(f"Welcome, {self.user}")
+        """Dashboard of the user's databases
 
-        canvas = tk.Canvas(self.root, bg=BG_LIGHT, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=canvas.yview)
+        The widgets are built once per login and only hidden when navigating
+        away, so coming back just re-shows them. The database list is fetched
+        in the background and missing rows are added DASHBOARD_BATCH at a time,
+        letting Tk draw between batches; sizes and table counts follow later.
+        """
+        self.clear()
+        dash = self.dashboard
+        if dash is None or dash['user'] != self.user:
+            if dash is not None:
+                dash['frame'].destroy()
+            dash = self.dashboard = self.build_dashboard()
+        current_screen.set(dash['title'])
+        self.busy_frame, self.busy_label = dash['busy']
+        dash['frame'].pack(fill=tk.BOTH, expand=True)
+        self.run_bg(get_user_dbs, self.user, callback=self.fill_dashboard, busy="Loading databases...")
+
+    def build_dashboard(self):
+        frame = tk.Frame(self.root, bg=BG_LIGHT)
+        title = f"Welcome, {self.user}"
+        self.header(title, frame)
+
+        canvas = tk.Canvas(frame, bg=BG_LIGHT, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview)
         scroll_frame = tk.Frame(canvas, bg=BG_LIGHT)
 
         scroll_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
         canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
 
-        dbs = get_user_dbs(self.user)
-        for db in dbs:
-            db_frame = tk.Frame(scroll_frame, bg='white', relief='raised', bd=1, padx=15, pady=10)
-            db_frame.pack(fill=tk.X, padx=20, pady=5)
-
-            info = tk.Frame(db_frame, bg='white')
-            info.pack(side=tk.LEFT, fill=tk.X, expand=True)
-            tk.Label(info, text=db['name'], font=('Arial', 12, 'bold'), bg='white').pack(anchor='w')
-            tk.Label(info, text=f"Created by: {db['creator']}",
-                     font=('Arial', 9), bg='white', fg='gray').pack(anchor='w')
-
-            btns = tk.Frame(db_frame, bg='white')
-            btns.pack(side=tk.RIGHT)
-            self.btn(btns, "Open", lambda d=db['name']: self.open_db(d)).pack(side=tk.LEFT, padx=2)
-            self.btn(btns, "Share", lambda d=db['name']: self.access_screen(d)).pack(side=tk.LEFT, padx=2)
-
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        btn_frame = tk.Frame(self.root, bg=BG_LIGHT)
+        btn_frame = tk.Frame(frame, bg=BG_LIGHT)
         btn_frame.pack(pady=10)
         self.btn(btn_frame, "New Database", self.create_db).pack(side=tk.LEFT, padx=5)
-        self.btn(btn_frame, "Logout", self.login_screen, BTN_DANGER).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Logout", self.logout, BTN_DANGER).pack(side=tk.LEFT, padx=5)
+        return {'user': self.user, 'title': title, 'frame': frame, 'list': scroll_frame,
+                'busy': (self.busy_frame, self.busy_label), 'rows': {}}  # rows: name -> (frame, info label)
+
+    def fill_dashboard(self, dbs):
+        """Bring the dashboard rows in line with dbs, building new rows in batches"""
+        dash, screen = self.dashboard, self.screen
+        names = {db['name'] for db in dbs}
+        for name in [name for name in dash['rows'] if name not in names]:
+            dash['rows'].pop(name)[0].destroy()
+        kept = [db['name'] for db in dbs if db['name'] in dash['rows']]
+        new = [db for db in dbs if db['name'] not in dash['rows']]
+
+        def build(start):
+            if screen != self.screen:
+                return  # navigated away; the next visit builds the rest
+            batch = new[start:start + DASHBOARD_BATCH]
+            for db in batch:
+                dash['rows'][db['name']] = self.dashboard_row(dash['list'], db)
+            if start + DASHBOARD_BATCH < len(new):
+                self.root.after(1, build, start + DASHBOARD_BATCH)
+            if batch:
+                summarize([db['name'] for db in batch])
+
+        def summarize(batch):
+            self.run_bg(lambda: {name: db_summary(name) for name in batch}, callback=show, busy=None)
+
+        def show(summaries):
+            for name, summary in summaries.items():
+                if name in dash['rows']:
+                    text = ("No database file" if summary is None else
+                            f"{summary['tables']} tables, {summary['size'] / 1024:.0f} KB")
+                    dash['rows'][name][1].config(text=text)
+
+        for start in range(0, len(kept), DASHBOARD_BATCH):
+            summarize(kept[start:start + DASHBOARD_BATCH])  # files may have changed since the last visit
+        build(0)
+
+    def dashboard_row(self, parent, db):
+        db_frame = tk.Frame(parent, bg='white', relief='raised', bd=1, padx=15, pady=10)
+        db_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        info = tk.Frame(db_frame, bg='white')
+        info.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Label(info, text=db['name'], font=('Arial', 12, 'bold'), bg='white').pack(anchor='w')
+        tk.Label(info, text=f"Created by: {db['creator']}",
+                 font=('Arial', 9), bg='white', fg='gray').pack(anchor='w')
+        details = tk.Label(info, text="...", font=('Arial', 9), bg='white', fg='gray')
+        details.pack(anchor='w')
+
+        btns = tk.Frame(db_frame, bg='white')
+        btns.pack(side=tk.RIGHT)
+        self.btn(btns, "Open", lambda d=db['name']: self.open_db(d)).pack(side=tk.LEFT, padx=2)
+        self.btn(btns, "Share", lambda d=db['name']: self.access_screen(d)).pack(side=tk.LEFT, padx=2)
+        return db_frame, details
+
+    def logout(self):
+        self.screen += 1  # drops dashboard batches and summaries still on their way
+        if self.dashboard is not None:
+            self.dashboard['frame'].destroy()
+            self.dashboard = None
+        self.user = None
+        self.current_db = None
+        self.worker.cancel()
+        clear_permission_cache()
+        self.run_bg(pool.close_all, callback=lambda _: self.login_screen(), busy="Logging out...")
 
     def create_db(self):
         name = simpledialog.askstring("New DB", "Database name:")
         if name:
-            db = DB(name)
-            db.close()
-            add_permission(name, self.user, self.user)
-            self.db_screen()
+            def create():
+                DB(name).close()
+                add_permission(name, self.user, self.user)
+
+            self.run_bg(create, callback=lambda _: self.db_screen(), busy="Creating database...")
 
     def access_screen(self, db_name):
         self.clear()
         self.header(f"Share: {db_name}")
 
+        bar = tk.Frame(self.root, bg=BG_LIGHT)
+        bar.pack(fill=tk.X, padx=20, pady=10)
+        tk.Label(bar, text="Search users:", bg=BG_LIGHT).pack(side=tk.LEFT, padx=5)
+        search_ent = tk.Entry(bar, width=30)
+        search_ent.pack(side=tk.LEFT, padx=5)
+
         canvas = tk.Canvas(self.root, bg=BG_LIGHT, highlightthickness=0)
         scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=canvas.yview)
         scroll_frame = tk.Frame(canvas, bg=BG_LIGHT)
 
         scroll_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
+        window = canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
+        canvas.bind("<Configure>", lambda e: canvas.itemconfigure(window, width=e.width))
         canvas.configure(yscrollcommand=scrollbar.set)
 
-        all_users = get_all_users()
-        current_users = get_db_users(db_name)
+        rows = []  # reusable (frame, name label, status label, button) per visible user
+        page = {'starts': [None], 'next': None, 'pattern': ''}
 
-        for user in all_users:
-            if user != self.user:
-                frame = tk.Frame(scroll_frame, bg='white', relief='raised', bd=1, padx=15, pady=10)
-                frame.pack(fill=tk.X, padx=20, pady=5)
+        def render(row, user, has_access):
+            _, name_label, status_label, button = row
+            name_label.config(text=user)
+            status_label.config(text="Has Access" if has_access else "No Access",
+                                fg=BTN_SUCCESS if has_access else 'gray')
+            button.config(text="Revoke" if has_access else "Grant Access",
+                          bg=BTN_DANGER if has_access else BTN_SUCCESS,
+                          command=lambda: toggle(row, user, has_access))
 
-                info = tk.Frame(frame, bg='white')
-                info.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                tk.Label(info, text=user, font=('Arial', 11, 'bold'), bg='white').pack(anchor='w')
+        def toggle(row, user, has_access):
+            def job():
+                if has_access:
+                    revoke_permission(db_name, user)
+                else:
+                    add_permission(db_name, user, self.user)
+                return user in get_db_users(db_name)  # another instance may have changed it first
 
-                has_access = user in current_users
-                status = "Has Access" if has_access else "No Access"
-                color = BTN_SUCCESS if has_access else 'gray'
-                tk.Label(info, text=status, font=('Arial', 9), bg='white', fg=color).pack(anchor='w')
+            def done(access):
+                if row[1].cget('text') == user:  # the row may show another user after paging
+                    render(row, user, access)
 
-                btns = tk.Frame(frame, bg='white')
-                btns.pack(side=tk.RIGHT)
+            self.run_bg(job, callback=done, busy="Updating access...")
 
-                if has_access:
-                    self.btn(btns, "Revoke", lambda u=user: self.revoke(db_name, u),
-                             BTN_DANGER).pack(side=tk.LEFT, padx=2)
+        def show(result):
+            users, current = result
+            page['next'] = users[-1] if len(users) > USER_PAGE_SIZE else None
+            users = users[:USER_PAGE_SIZE]
+            while len(rows) < len(users):
+                frame = tk.Frame(scroll_frame, bg='white', relief='raised', bd=1, padx=15, pady=10)
+                info = tk.Frame(frame, bg='white')
+                info.pack(side=tk.LEFT, fill=tk.X, expand=True)
+                name_label = tk.Label(info, font=('Arial', 11, 'bold'), bg='white')
+                name_label.pack(anchor='w')
+                status_label = tk.Label(info, font=('Arial', 9), bg='white')
+                status_label.pack(anchor='w')
+                button = self.btn(frame, "", None)
+                button.pack(side=tk.RIGHT, padx=2)
+                rows.append((frame, name_label, status_label, button))
+            for i, row in enumerate(rows):
+                if i < len(users):
+                    render(row, users[i], users[i] in current)
+                    row[0].pack(fill=tk.X, padx=20, pady=5)
                 else:
-                    self.btn(btns, "Grant Access", lambda u=user: self.grant(db_name, u),
-                             BTN_SUCCESS).pack(side=tk.LEFT, padx=2)
+                    row[0].pack_forget()
+            page_label.config(text=f"Page {len(page['starts'])}")
+            prev_btn.config(state=tk.NORMAL if len(page['starts']) > 1 else tk.DISABLED)
+            next_btn.config(state=tk.NORMAL if page['next'] else tk.DISABLED)
+            canvas.yview_moveto(0)
+
+        def load():
+            pattern, after = page['pattern'], page['starts'][-1]
+            self.run_bg(lambda: (search_users(pattern, after, USER_PAGE_SIZE + 1, exclude=self.user),
+                                 get_db_users(db_name)), callback=show, busy="Loading users...")
+
+        def search():
+            page['pattern'], page['starts'] = search_ent.get(), [None]
+            load()
+
+        def next_page():
+            page['starts'].append(page['next'])
+            load()
+
+        def prev_page():
+            page['starts'].pop()
+            load()
+
+        search_ent.bind('<Return>', lambda e: search())
+        self.btn(bar, "Search", search).pack(side=tk.LEFT, padx=5)
+
+        nav = tk.Frame(self.root, bg=BG_LIGHT)
+        nav.pack(side=tk.BOTTOM, pady=10)
+        prev_btn = self.btn(nav, "< Prev", prev_page)
+        prev_btn.pack(side=tk.LEFT, padx=5)
+        page_label = tk.Label(nav, text="", bg=BG_LIGHT)
+        page_label.pack(side=tk.LEFT, padx=10)
+        next_btn = self.btn(nav, "Next >", next_page)
+        next_btn.pack(side=tk.LEFT, padx=5)
+        self.btn(nav, "Back", self.db_screen).pack(side=tk.LEFT, padx=20)
 
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
-
-        self.btn(self.root, "Back", self.db_screen).pack(pady=10)
-
-    def grant(self, db_name, username):
-        add_permission(db_name, username, self.user)
-        self.access_screen(db_name)
-
-    def revoke(self, db_name, username):
-        revoke_permission(db_name, username)
-        self.access_screen(db_name)
+        load()
 
     def open_db(self, name):
         self.current_db = name
         self.table_list_screen()
 
     def table_list_screen(self):
+        self.run_db(lambda db: (db.get_tables(), db.fts_tables()), self.show_table_list,
+                    busy="Loading tables...")
+
+    def show_table_list(self, result):
+        tables, indexed = result
         self.clear()
         self.header(f"DB: {self.current_db}")
 
         frame = tk.Frame(self.root, bg='white', padx=20, pady=20)
         frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
-        db = DB(self.current_db)
-        tables = db.get_tables()
-        db.close()
-
-        tk.Label(frame, text="Tables", font=('Arial', 12, 'bold'), bg='white').pack(anchor='w', pady=10)
+        bar = tk.Frame(frame, bg='white')
+        bar.pack(fill=tk.X)
+        tk.Label(bar, text="Tables", font=('Arial', 12, 'bold'), bg='white').pack(side=tk.LEFT, pady=10)
+        if indexed:
+            self.btn(bar, "Search", lambda: self.search(search_ent.get())).pack(side=tk.RIGHT, padx=5)
+            search_ent = tk.Entry(bar, width=30)
+            search_ent.pack(side=tk.RIGHT, padx=5)
+            search_ent.bind('<Return>', lambda e: self.search(search_ent.get()))
+        else:
+            tk.Label(bar, text="Index a table to search this database", font=('Arial', 9), fg='gray',
+                     bg='white').pack(side=tk.RIGHT)
+
+        def index(table, drop):
+            self.run_db(lambda db: db.drop_fts(table) if drop else db.create_fts(table),
+                        lambda _: self.table_list_screen(),
+                        busy="Dropping index..." if drop else "Building search index...")
 
         for table in tables:
             t_frame = tk.Frame(frame, bg=BG_LIGHT, padx=10, pady=8)
             t_frame.pack(fill=tk.X, pady=3)
             tk.Label(t_frame, text=table, font=('Arial', 10), bg=BG_LIGHT).pack(side=tk.LEFT)
             self.btn(t_frame, "Open", lambda t=table: self.table_screen(t), BTN_SUCCESS).pack(side=tk.RIGHT)
+            drop = table in indexed
+            self.btn(t_frame, "Drop Index" if drop else "Index", lambda t=table, d=drop: index(t, d)
+                     ).pack(side=tk.RIGHT, padx=5)
 
         btn_frame = tk.Frame(self.root, bg=BG_LIGHT)
         btn_frame.pack(pady=10)
         self.btn(btn_frame, "New Table", self.create_table).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Import CSV", self.import_csv).pack(side=tk.LEFT, padx=5)
         self.btn(btn_frame, "Share DB", lambda: self.access_screen(self.current_db)).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Backups", self.backups).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Maintenance", self.maintenance_screen).pack(side=tk.LEFT, padx=5)
         self.btn(btn_frame, "Delete DB", self.delete_db, BTN_DANGER).pack(side=tk.LEFT, padx=5)
         self.btn(btn_frame, "Back", self.db_screen).pack(side=tk.LEFT, padx=5)
 
+    def search(self, text):
+        """Search every indexed table of the current database and list the best matches"""
+        if not text.strip():
+            return
+        win = tk.Toplevel(self.root)
+        win.title(f"Search: {text}")
+        win.geometry("800x400")
+        win.configure(bg=BG_LIGHT)
+
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        status = tk.Label(frame, text="Searching...", font=('Arial', 10, 'bold'), bg='white')
+        status.pack(anchor='w')
+
+        cols = ('table', 'rowid', 'match')
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for col, width in zip(cols, (120, 80, 550)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, pady=5)
+        tk.Label(frame, text="Double-click a result to open its row", font=('Arial', 9), fg='gray',
+                 bg='white').pack(anchor='w')
+
+        def show(hits):
+            if not win.winfo_exists():
+                return
+            status.config(text=f"{len(hits)} results" if hits else "No results")
+            for hit in hits:
+                tree.insert('', tk.END, values=(hit['table'], hit['rowid'], hit['snippet']))
+
+        def failed(e):
+            if win.winfo_exists():
+                status.config(text=f"Error: {e}", fg='red')
+
+        def open_hit(_):
+            item = tree.focus()
+            if item:
+                table, rowid, _ = tree.item(item, 'values')
+                win.destroy()
+                self.table_screen(table, int(rowid))
+
+        tree.bind('<Double-1>', open_hit)
+        self.run_db(lambda db: db.search(text), show, errback=failed, busy="Searching...")
+
     def create_table(self):
         name = simpledialog.askstring("New Table", "Table name:")
         if name:
@@ -423,13 +932,10 @@ class App:
         def create():
             cols = {e[0].get(): e[1].get() for e in col_entries if e[0].get()}
             if cols:
-                try:
-                    db = DB(self.current_db)
-                    db.create_table(table_name, cols)
-                    db.close()
-                    self.table_list_screen()
-                except Exception as e:
-                    error_label.config(text=f"Error: {str(e)}")
+                self.run_db(lambda db: db.create_table(table_name, cols),
+                            lambda _: self.table_list_screen(),
+                            errback=lambda e: error_label.config(text=f"Error: {str(e)}"),
+                            busy="Creating table...")
             else:
                 error_label.config(text="Add at least one column")
 
@@ -442,48 +948,472 @@ class App:
         self.btn(btn_frame, "Back", self.table_list_screen).pack(side=tk.LEFT, padx=5)
 
     def delete_db(self):
-        try:
-            os.remove(f"{self.current_db}.db")
-            conn = sql.connect(USER_DB)
-            c = conn.cursor()
-            c.execute("DELETE FROM permissions WHERE db_name = ?", (self.current_db,))
-            conn.commit()
-            conn.close()
-            self.db_screen()
-        except Exception as e:
-            pass
-
-    def table_screen(self, table):
+        name = self.current_db
+        keep = messagebox.askyesnocancel("Delete DB", f"Delete {name}? Take a backup snapshot first?")
+        if keep is None:
+            return
+
+        def delete():
+            if keep:
+                backup_db(name)
+            pool.close(f"{name}.db")
+            os.remove(f"{name}.db")
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(f"{name}.db{suffix}"):
+                    os.remove(f"{name}.db{suffix}")
+            revoke_all_permissions(name)
+
+        self.run_bg(delete, callback=lambda _: self.db_screen(), errback=lambda e: None,
+                    busy="Deleting database...")
+
+    def backups(self):
+        name, screen = self.current_db, self.screen  # opened from the table list
+        win = tk.Toplevel(self.root)
+        win.title(f"Backups: {name}")
+        win.geometry("450x400")
+        win.configure(bg=BG_LIGHT)
+
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        tree = ttk.Treeview(frame, columns=('snapshot', 'size'), show='headings', selectmode='browse')
+        tree.heading('snapshot', text='Snapshot')
+        tree.heading('size', text='Size')
+        tree.column('snapshot', width=200)
+        tree.column('size', width=100, anchor='e')
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        bar = ttk.Progressbar(frame, length=300, mode='determinate')
+        bar.pack(fill=tk.X, pady=10)
+        status = tk.Label(frame, text="", font=('Arial', 9), bg='white')
+        status.pack(pady=5)
+
+        cancel = threading.Event()
+        state = {}
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for path, size, mtime in list_backups(name):
+                tree.insert('', tk.END, iid=path, values=(
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime)), f"{size / 1048576:.1f} MB"))
+
+        def on_progress(done, total):
+            state['done'], state['total'] = done, total
+
+        def poll():
+            if not win.winfo_exists() or 'finished' in state:
+                return
+            bar.config(maximum=max(state.get('total', 0), 1), value=state.get('done', 0))
+            win.after(100, poll)
+
+        def finished(message, color='black'):
+            state['finished'] = True
+            if win.winfo_exists():
+                status.config(text=message, fg=color)
+                refresh()
+
+        def backup():
+            state.clear()
+            cancel.clear()
+            started = self.run_thread(lambda: backup_db(name, progress=on_progress, cancel=cancel),
+                                      lambda path: finished("Backup complete" if path else "Backup cancelled",
+                                                            BTN_SUCCESS if path else 'gray'),
+                                      lambda e: finished(f"Error: {e}", 'red'))
+            if started:
+                status.config(text="Backing up...", fg='black')
+                poll()
+            else:
+                status.config(text="Another backup is running", fg='red')
+
+        def restore():
+            selected = tree.selection()
+            if not selected:
+                return
+            when = tree.set(selected[0], 'snapshot')
+            if not messagebox.askyesno("Restore", f"Replace {name} with the snapshot from {when}? "
+                                                  f"Changes made since then will be lost.", parent=win):
+                return
+
+            def restored(_):
+                finished(f"Restored snapshot from {when}", BTN_SUCCESS)
+                if self.screen == screen:  # still on the table list, so no unsaved edits to lose
+                    self.table_list_screen()
+
+            if self.run_thread(lambda: restore_db(name, selected[0]), restored,
+                               lambda e: finished(f"Error: {e}", 'red')):
+                status.config(text="Restoring...", fg='black')
+            else:
+                status.config(text="Another backup is running", fg='red')
+
+        btn_frame = tk.Frame(frame, bg='white')
+        btn_frame.pack(pady=10)
+        self.btn(btn_frame, "Back Up Now", backup, BTN_SUCCESS).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Cancel", cancel.set, BTN_DANGER).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Restore", restore).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Close", win.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def maintenance_screen(self):
+        self.clear()
+        name = self.current_db
+        self.header(f"Maintenance: {name}")
+
+        frame = tk.Frame(self.root, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+
+        fields = [('file_size', "File size"), ('wal_size', "WAL size"), ('page_size', "Page size"),
+                  ('page_count', "Pages"), ('freelist_count', "Free pages"), ('unused', "Unused space in pages"),
+                  ('fragmentation', "Fragmentation"), ('auto_vacuum', "Auto-vacuum"),
+                  ('journal_mode', "Journal mode"), ('cache_size', "Cache size"), ('mmap_size', "Memory map")]
+        labels = {}
+        for row, (field, text) in enumerate(fields):
+            tk.Label(frame, text=text + ":", bg='white').grid(row=row, column=0, sticky='w', pady=2)
+            labels[field] = tk.Label(frame, text="...", bg='white', font=('Arial', 10, 'bold'))
+            labels[field].grid(row=row, column=1, sticky='w', padx=10, pady=2)
+
+        row = len(fields)
+        tk.Label(frame, text="Storage profile:", bg='white').grid(row=row, column=0, sticky='w', pady=10)
+        profile_var = tk.StringVar()
+        profile_box = ttk.Combobox(frame, textvariable=profile_var, values=list(STORAGE_PROFILES),
+                                   state="readonly", width=12)
+        profile_box.grid(row=row, column=1, sticky='w', padx=10)
+        status = tk.Label(frame, text="", font=('Arial', 9), bg='white')
+        status.grid(row=row + 1, column=0, columnspan=2, sticky='w', pady=5)
+
+        def mb(size):
+            return f"{size / 1048576:.1f} MB"
+
+        def percent(value):
+            return "n/a" if value is None else f"{value:.1%}"
+
+        def show(info):
+            formats = {'file_size': mb, 'wal_size': mb, 'unused': percent, 'fragmentation': percent,
+                       'cache_size': lambda v: f"{-v} KiB" if v < 0 else f"{v} pages",
+                       'mmap_size': lambda v: "off" if not v else mb(v)}
+            for field, label in labels.items():
+                value = info[field]
+                label.config(text=formats[field](value) if field in formats and value is not None else value)
+            profile_var.set(info['profile'])
+            vacuum_btns['incremental'].config(
+                state=tk.NORMAL if info['auto_vacuum'] == 'incremental' else tk.DISABLED)
+
+        def refresh():
+            self.run_db(lambda db: db.storage_info(), show, busy="Reading storage info...")
+
+        def run(op, message, *args):
+            def job(db):
+                getattr(db, op)(*args)
+                return db.storage_info()
+
+            def done(info):
+                status.config(text=f"{message} done", fg=BTN_SUCCESS)
+                show(info)
+
+            status.config(text=f"{message}...", fg='black')
+            self.run_db(job, done, busy=f"{message}...")
+
+        def vacuum():
+            if messagebox.askyesno("Vacuum", "VACUUM rewrites the whole file and blocks writes until it "
+                                             "finishes. It also enables incremental auto-vacuum. Continue?"):
+                run('vacuum', "Vacuum", 'INCREMENTAL')
+
+        def apply_profile(_=None):
+            profile = profile_var.get()
+            self.run_bg(lambda: set_profile(name, profile), callback=lambda _: refresh(), busy="Applying profile...")
+
+        profile_box.bind('<<ComboboxSelected>>', apply_profile)
+
+        btn_frame = tk.Frame(self.root, bg=BG_LIGHT)
+        btn_frame.pack(pady=10)
+        self.btn(btn_frame, "Refresh", refresh).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Analyze", lambda: run('analyze', "Analyze")).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Optimize", lambda: run('optimize', "Optimize")).pack(side=tk.LEFT, padx=5)
+        vacuum_btns = {'incremental': self.btn(btn_frame, "Incremental Vacuum",
+                                               lambda: run('incremental_vacuum', "Incremental vacuum")),
+                       'full': self.btn(btn_frame, "Vacuum", vacuum, BTN_DANGER)}
+        for button in vacuum_btns.values():
+            button.pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Back", self.table_list_screen).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def table_screen(self, table, rowid=None):
+        self.run_db(lambda db: db.table_info(table), lambda info: self.show_table(table, info, rowid),
+                    busy="Opening table...")
+
+    def show_table(self, table, info, rowid=None):
+        cols, key, pk, types = list(info['columns']), info['key'], info['pk'], info['types']
         self.clear()
         self.header(f"Table: {table}")
 
         frame = tk.Frame(self.root, bg='white', padx=20, pady=20)
         frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
-        db = DB(self.current_db)
-        data = db.fetch_all(table)
-        cols = db.get_columns(table)
-        db.close()
+        view = {'where': None, 'params': [], 'order': None, 'desc': False}
+
+        def fetch(done, failed, after=None, before=None):
+            args = dict(view)
+            self.run_db(lambda db: db.fetch_page(table, key, after=after, before=before, **args), done,
+                        reset=failed,
+                        busy="Loading rows..." if after is None and before is None else None)
+
+        def apply_filter():
+            col, op, value = col_var.get(), op_var.get(), value_ent.get()
+            view['where'], view['params'] = filter_clause(col, op, value)
+            pager.load()
+            self.suggest_index(table, col, key)
+
+        def clear_filter():
+            value_ent.delete(0, tk.END)
+            view['where'], view['params'] = None, []
+            pager.load()
+
+        def sort_by(col):
+            if view['order'] != col:
+                view['order'], view['desc'] = col, False
+            elif not view['desc']:
+                view['desc'] = True
+            else:
+                view['order'] = None
+            for c in cols:
+                arrow = (' \u25bc' if view['desc'] else ' \u25b2') if c == view['order'] else ''
+                tree.heading(c, text=c + arrow)
+            pager.sort_len = 1 if view['order'] else 0
+            pager.load()
+            if view['order']:
+                self.suggest_index(table, col, key)
+
+        def show_plan():
+            args = dict(view)
+
+            def explain(db):
+                query, params = db.page_query(table, key, **args)
+                return query, db.explain(query, params)
+
+            self.run_db(explain, lambda plan: messagebox.showinfo(
+                "Query plan", plan[0] + "\n\n" + "\n".join(plan[1])), busy="Explaining...")
+
+        bar = tk.Frame(frame, bg='white')
+        bar.pack(fill=tk.X, pady=(0, 10))
+        col_var = tk.StringVar(value=cols[0] if cols else '')
+        ttk.Combobox(bar, textvariable=col_var, values=cols, state="readonly", width=15).pack(side=tk.LEFT, padx=5)
+        op_var = tk.StringVar(value='contains')
+        ttk.Combobox(bar, textvariable=op_var, values=list(FILTER_OPS), state="readonly",
+                     width=10).pack(side=tk.LEFT, padx=5)
+        value_ent = tk.Entry(bar, width=25)
+        value_ent.pack(side=tk.LEFT, padx=5)
+        value_ent.bind('<Return>', lambda e: apply_filter())
+        self.btn(bar, "Filter", apply_filter).pack(side=tk.LEFT, padx=5)
+        self.btn(bar, "Clear", clear_filter).pack(side=tk.LEFT, padx=5)
+        self.btn(bar, "Plan", show_plan).pack(side=tk.LEFT, padx=5)
 
         tree = ttk.Treeview(frame, columns=cols, show='headings', height=15)
         for col in cols:
             tree.heading(col, text=col)
+            if not is_blob(types[col]):  # sorting would put the BLOBs in every page
+                tree.heading(col, command=lambda c=col: sort_by(c))
             tree.column(col, width=100)
-        for row in data:
-            tree.insert('', tk.END, values=row)
+        tree.tag_configure('dirty', background='#fcf3cf')
 
         scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
+        pager = PagedTree(tree, scrollbar, fetch, len(key))
+        if rowid is None:
+            pager.load()
+        else:
+            pager.load(after=(rowid - 1,), select=repr((rowid,)))
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
+        def edit_cell(event):
+            iid, column = tree.identify_row(event.y), tree.identify_column(event.x)
+            if not iid or not column:
+                return
+            col = cols[int(column[1:]) - 1]
+            if col in pk:
+                return  # changing a key would move the row
+            if is_blob(types[col]):
+                blob_menu(iid, col).tk_popup(event.x_root, event.y_root)
+                return
+            bbox = tree.bbox(iid, column)
+            if not bbox:
+                return
+            x, y, width, height = bbox
+            editor = tk.Entry(tree)
+            editor.insert(0, tree.set(iid, col))
+            editor.select_range(0, tk.END)
+            editor.place(x=x, y=y, width=width, height=height)
+            editor.focus()
+            state = {'open': True}
+
+            def close(keep):
+                if not state['open']:
+                    return
+                state['open'] = False
+                value = editor.get()
+                editor.destroy()
+                if keep and tree.exists(iid) and value != tree.set(iid, col):
+                    pager.edit(iid, col, value)
+                    show_dirty()
+
+            editor.bind('<Return>', lambda e: close(True))
+            editor.bind('<FocusOut>', lambda e: close(True))
+            editor.bind('<Escape>', lambda e: close(False))
+
+        def show_dirty():
+            count = len(pager.dirty)
+            save_btn.config(text=f"Save Changes ({count})" if count else "Save Changes",
+                            state=tk.NORMAL if count else tk.DISABLED)
+            discard_btn.config(state=tk.NORMAL if count else tk.DISABLED)
+
+        def refreshed(updates, order, moved=False):
+            def done(rows):
+                for row_key, handled in updates:  # edits made meanwhile stay pending
+                    edits = pager.dirty.get(row_key, {})
+                    for col, value in handled.items():
+                        if col in edits and edits[col] == value:
+                            del edits[col]
+                    if not edits:
+                        pager.dirty.pop(row_key, None)
+                if order == view['order']:  # otherwise the rows don't match the pages being loaded
+                    if moved:
+                        pager.load()  # edited rows now sort elsewhere; the window's cursors are stale
+                    else:
+                        pager.refresh(rows)
+                show_dirty()
+            return done
+
+        def save_edits():
+            updates = [(row_key, dict(values)) for row_key, values in pager.dirty.items()]  # as of now
+            keys = [row_key for row_key, _ in updates]
+            order = view['order']
+            moved = order is not None and any(order in values for _, values in updates)
+
+            def save(db):
+                db.update_many(table, key, updates)
+                return db.fetch_rows(table, key, keys, order)
+
+            self.run_db(save, refreshed(updates, order, moved), busy="Saving changes...")
+
+        def discard_edits():
+            updates = [(row_key, dict(values)) for row_key, values in pager.dirty.items()]
+            keys = [row_key for row_key, _ in updates]
+            order = view['order']
+            self.run_db(lambda db: db.fetch_rows(table, key, keys, order), refreshed(updates, order),
+                        busy="Discarding changes...")
+
+        def blob_menu(iid, col):
+            menu = tk.Menu(tree, tearoff=0)
+            menu.add_command(label="Save to file...", command=lambda: save_blob(iid, col))
+            menu.add_command(label="Load from file...", command=lambda: load_blob(iid, col))
+            return menu
+
+        def blob_rowid(iid):
+            if key != ['rowid']:
+                messagebox.showerror("BLOB", "BLOB files are only supported for tables with a rowid")
+                return None
+            return pager.keys[iid][0]
+
+        def save_blob(iid, col):
+            rowid = blob_rowid(iid)
+            if rowid is None:
+                return
+            path = filedialog.asksaveasfilename(initialfile=f"{table}_{col}_{rowid}.bin")
+            if path:
+                self.run_db(lambda db: db.read_blob(table, col, rowid, path), busy="Saving BLOB...")
+
+        def load_blob(iid, col):
+            rowid = blob_rowid(iid)
+            if rowid is None:
+                return
+            path = filedialog.askopenfilename()
+            if path:
+                row_key, order = pager.keys[iid], view['order']
+
+                def load(db):
+                    db.write_blob(table, col, rowid, path)
+                    return db.fetch_rows(table, key, [row_key], order)
+
+                self.run_db(load, refreshed([], order), busy="Loading BLOB...")
+
+        def back():
+            if pager.dirty and not messagebox.askyesno("Unsaved changes",
+                                                       "Discard unsaved changes to this table?"):
+                return
+            self.table_list_screen()
+
+        tree.bind('<Double-1>', edit_cell)
+
+        edit_frame = tk.Frame(self.root, bg=BG_LIGHT)
+        edit_frame.pack(pady=(10, 0))
+        save_btn = self.btn(edit_frame, "Save Changes", save_edits, BTN_SUCCESS)
+        save_btn.pack(side=tk.LEFT, padx=5)
+        discard_btn = self.btn(edit_frame, "Discard", discard_edits)
+        discard_btn.pack(side=tk.LEFT, padx=5)
+        tk.Label(edit_frame, text="Double-click a cell to edit it", font=('Arial', 9), fg='gray',
+                 bg=BG_LIGHT).pack(side=tk.LEFT, padx=5)
+        show_dirty()
+
         btn_frame = tk.Frame(self.root, bg=BG_LIGHT)
         btn_frame.pack(pady=10)
         self.btn(btn_frame, "Add Record", lambda: self.add_record(table, cols)).pack(side=tk.LEFT, padx=5)
         self.btn(btn_frame, "Delete Table", lambda: self.delete_table(table)).pack(side=tk.LEFT, padx=5)
-        self.btn(btn_frame, "Export CSV", lambda: self.export(table)).pack(side=tk.LEFT, padx=5)
-        self.btn(btn_frame, "Delete Record", lambda: self.delete_record(tree, table, cols)).pack(side=tk.LEFT, padx=5)
-        self.btn(btn_frame, "Back", self.table_list_screen).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Import CSV", lambda: self.import_csv(table)).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Export CSV", lambda: self.export(table, cols)).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Column Stats", lambda: self.column_stats(table)).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Delete Record", lambda: self.delete_record(pager, table, key)).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Back", back).pack(side=tk.LEFT, padx=5)
+
+    def suggest_index(self, table, col, key):
+        """Offer an index once an unindexed column keeps being filtered or sorted on"""
+        usage = (self.current_db, table, col)
+        self.column_usage[usage] = self.column_usage.get(usage, 0) + 1
+        if self.column_usage[usage] != INDEX_SUGGEST_AFTER or usage in self.index_declined or col in key:
+            return
+
+        def offer(indexed):
+            if indexed:
+                return
+            if messagebox.askyesno("Create index?", f"'{col}' is often used to filter or sort {table} "
+                                                    f"but has no index. Create one?"):
+                self.run_db(lambda db: db.create_index(table, col), busy="Creating index...")
+            else:
+                self.index_declined.add(usage)
+
+        self.run_db(lambda db: db.has_index(table, col), offer, busy=None)
+
+    def column_stats(self, table):
+        win = tk.Toplevel(self.root)
+        win.title(f"Statistics: {table}")
+        win.geometry("800x400")
+        win.configure(bg=BG_LIGHT)
+
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        rows_label = tk.Label(frame, text="Computing statistics...", font=('Arial', 10, 'bold'), bg='white')
+        rows_label.pack(anchor='w')
+
+        cols = ('column', 'type', 'nulls', 'distinct', 'min', 'max', 'avg', 'most common')
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for col, width in zip(cols, (100, 70, 60, 60, 80, 80, 70, 250)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        def show(stats):
+            if not win.winfo_exists():
+                return
+            rows_label.config(text=f"{stats['rows']} rows")
+            for col, st in stats['columns'].items():
+                avg = '' if st['avg'] is None else f"{st['avg']:.4g}"
+                common = ', '.join(f"{value} ({count})" for value, count in st['top'])
+                tree.insert('', tk.END, values=(col, st['type'], st['nulls'], st['distinct'],
+                                                '' if st['min'] is None else st['min'],
+                                                '' if st['max'] is None else st['max'], avg, common))
+
+        def failed(e):
+            if win.winfo_exists():
+                rows_label.config(text=f"Error: {e}", fg='red')
+
+        self.run_db(lambda db: db.column_stats(table), show, errback=failed, busy="Computing statistics...")
 
     def add_record(self, table, cols):
         win = tk.Toplevel(self.root)
@@ -506,14 +1436,13 @@ class App:
 
         def save():
             data = {col: ent.get() for col, ent in entries.items()}
-            try:
-                db = DB(self.current_db)
-                db.insert(table, data)
-                db.close()
+
+            def saved(_):
                 win.destroy()
                 self.table_screen(table)
-            except Exception as e:
-                error_label.config(text=f"Error: {str(e)}")
+
+            self.run_db(lambda db: db.insert(table, data), saved,
+                        errback=lambda e: error_label.config(text=f"Error: {str(e)}"), busy="Saving...")
 
         btn_frame = tk.Frame(frame, bg='white')
         btn_frame.pack(pady=15)
@@ -521,41 +1450,191 @@ class App:
         self.btn(btn_frame, "Cancel", win.destroy).pack(side=tk.LEFT, padx=5)
 
     def delete_table(self, table):
-        try:
-            db = DB(self.current_db)
-            db.drop_table(table)
-            db.close()
-            self.table_list_screen()
-        except Exception as e:
-            pass
-
-    def export(self, table):
-        try:
-            db = DB(self.current_db)
-            db.export_csv(table)
-            db.close()
-        except Exception as e:
-            pass
-
-    def delete_record(self, tree, table, cols):
-        selected = tree.selection()
+        self.run_db(lambda db: db.drop_table(table), lambda _: self.table_list_screen(),
+                    errback=lambda e: None, busy="Deleting table...")
+
+    def export(self, table, cols):
+        win = tk.Toplevel(self.root)
+        win.title("Export CSV")
+        win.configure(bg=BG_LIGHT)
+
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        name = self.current_db
+
+        tk.Label(frame, text="Columns", font=('Arial', 10, 'bold'), bg='white').pack(anchor='w')
+        col_vars = {}
+        for col in cols:
+            var = tk.BooleanVar(value=True)
+            tk.Checkbutton(frame, text=col, variable=var, bg='white').pack(anchor='w')
+            col_vars[col] = var
+
+        tk.Label(frame, text="WHERE (optional)", bg='white').pack(anchor='w', pady=2)
+        where_ent = tk.Entry(frame, width=40)
+        where_ent.pack(fill=tk.X, pady=5)
+        gzip_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Compress (gzip)", variable=gzip_var, bg='white').pack(anchor='w')
+
+        bar = ttk.Progressbar(frame, length=300, mode='determinate')
+        bar.pack(fill=tk.X, pady=10)
+        status = tk.Label(frame, text="", font=('Arial', 9), bg='white')
+        status.pack(pady=5)
+
+        cancel = threading.Event()
+        state = {}
+
+        def start():
+            columns = [col for col, var in col_vars.items() if var.get()]
+            if not columns:
+                status.config(text="Select at least one column", fg='red')
+                return
+            ext = '.csv.gz' if gzip_var.get() else '.csv'
+            path = filedialog.asksaveasfilename(parent=win, initialfile=table + ext, defaultextension=ext)
+            if not path:
+                return
+            where, compress = where_ent.get().strip() or None, gzip_var.get()
+            state.clear()
+            cancel.clear()
+            export_btn.config(state=tk.DISABLED)
+
+            def on_progress(done, total):
+                state['done'], state['total'] = done, total
+
+            def work():
+                try:
+                    db = DB(name)
+                    state['result'] = db.export_csv(table, path, columns, where, compress=compress,
+                                                    progress=on_progress, cancel=cancel)
+                    db.close()
+                except Exception as e:
+                    state['error'] = e
+                state['finished'] = True
+
+            state['future'] = self.worker.submit(work, path=f"{name}.db")
+            poll(path)
+
+        def poll(path):
+            if not win.winfo_exists():
+                return
+            done, total = state.get('done', 0), state.get('total') or 0
+            bar.config(maximum=max(total, 1), value=done)
+            if not state.get('finished') and not state['future'].cancelled():
+                status.config(text=f"{done} / {total} rows", fg='black')
+                win.after(100, poll, path)
+                return
+            export_btn.config(state=tk.NORMAL)
+            if 'error' in state and str(state['error']) != 'interrupted':
+                status.config(text=f"Error: {state['error']}", fg='red')
+            elif state.get('result') is None:
+                status.config(text="Export cancelled", fg='gray')
+            else:
+                status.config(text=f"Exported {state['result']} rows to {os.path.basename(path)}", fg=BTN_SUCCESS)
+
+        def stop():
+            cancel.set()
+            if 'future' in state:
+                self.worker.cancel(state['future'])
+
+        def close():
+            stop()
+            win.destroy()
+
+        btn_frame = tk.Frame(frame, bg='white')
+        btn_frame.pack(pady=15)
+        export_btn = self.btn(btn_frame, "Export", start, BTN_SUCCESS)
+        export_btn.pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Cancel", stop, BTN_DANGER).pack(side=tk.LEFT, padx=5)
+        self.btn(btn_frame, "Close", close).pack(side=tk.LEFT, padx=5)
+        win.protocol("WM_DELETE_WINDOW", close)
+
+    def import_csv(self, table=None):
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv *.csv.gz"), ("All files", "*.*")])
+        if not path:
+            return
+        if table is None:
+            base = os.path.basename(path)
+            table = simpledialog.askstring("Import CSV", "Table name:", initialvalue=base.split('.')[0])
+            if not table:
+                return
+
+        win = tk.Toplevel(self.root)
+        win.title("Import CSV")
+        win.configure(bg=BG_LIGHT)
+        frame = tk.Frame(win, bg='white', padx=20, pady=20)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        tk.Label(frame, text=f"{os.path.basename(path)} -> {table}", font=('Arial', 10, 'bold'),
+                 bg='white').pack(anchor='w')
+        bar = ttk.Progressbar(frame, length=300, mode='indeterminate')
+        bar.pack(fill=tk.X, pady=10)
+        bar.start()
+        status = tk.Label(frame, text="Importing...", font=('Arial', 9), bg='white', justify=tk.LEFT)
+        status.pack(anchor='w', pady=5)
+
+        cancel = threading.Event()
+        state = {}
+        name = self.current_db
+
+        def on_progress(rows):
+            state['rows'] = rows
+
+        def work():
+            try:
+                db = DB(name)
+                state['result'] = db.import_csv(table, path, progress=on_progress, cancel=cancel)
+                db.close()
+            except Exception as e:
+                state['error'] = e
+            state['finished'] = True
+
+        def poll():
+            if not win.winfo_exists():
+                return
+            if not state.get('finished') and not future.cancelled():
+                status.config(text=f"{state.get('rows', 0)} rows imported...")
+                win.after(200, poll)
+                return
+            bar.stop()
+            cancel_btn.config(text="Close", command=win.destroy)
+            if future.cancelled() or str(state.get('error')) == 'interrupted':
+                status.config(text="Import cancelled", fg='gray')
+                return
+            if 'error' in state:
+                status.config(text=f"Error: {state['error']}", fg='red')
+                return
+            result = state['result']
+            lines = [f"{result['rows']} rows in {result['seconds']:.2f}s ({result['rows_per_sec']:.0f} rows/s)"]
+            if result['cancelled']:
+                lines.append("Import cancelled")
+            if result['rejected']:
+                lines.append(f"{len(result['rejected'])} rejected lines:")
+                lines += [f"  line {line}: {reason}" for line, reason in result['rejected'][:20]]
+            status.config(text='\n'.join(lines), fg='black')
+            if self.current_db == name:
+                self.table_screen(table)
+
+        def stop():
+            cancel.set()
+            self.worker.cancel(future)
+
+        btn_frame = tk.Frame(frame, bg='white')
+        btn_frame.pack(pady=15)
+        cancel_btn = self.btn(btn_frame, "Cancel", stop, BTN_DANGER)
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+        win.protocol("WM_DELETE_WINDOW", lambda: (stop(), win.destroy()))
+
+        future = self.worker.submit(work, path=f"{name}.db")
+        poll()
+
+    def delete_record(self, pager, table, key):
+        selected = pager.tree.selection()
         if not selected:
             return
-        try:
-            db = DB(self.current_db)
-            for item in selected:
-                values = tree.item(item, 'values')
-                conditions = {cols[i]: values[i] for i in range(len(cols))}
-                where_clause = ' AND '.join([f"{col}=?" for col in conditions.keys()])
-                db.c.execute(f"DELETE FROM {table} WHERE {where_clause}", tuple(conditions.values()))
-            db.conn.commit()
-            db.close()
-            self.table_screen(table)
-        except Exception as e:
-            pass
-
-# Run app
-init_user_db()
-app = App()
-app.login_screen()
-app.run()
\ No newline at end of file
+        keys = pager.selected_keys()
+        self.run_db(lambda db: db.delete_many(table, key, keys), lambda _: pager.delete(selected),
+                    errback=lambda e: None, busy="Deleting records...")
+
+if __name__ == "__main__":
+    init_user_db()
+    app = App()
+    app.login_screen()
+    app.run()
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Benchmarks for the hot paths, on a synthetic database of configurable shape.
+
+    python bench.py --rows 200000 --output baseline.json
+    python bench.py --rows 200000 --compare baseline.json   # exit 1 on slowdowns
+
+Every run generates fresh databases in a scratch directory from --seed, so
+two runs with the same options time the same data. The table view benchmark
+needs a display; without one it is reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import core
+
+TYPES = ('INTEGER', 'REAL', 'TEXT', 'BLOB')
+
+
+def generate(args, rng):
+    """Create bench.db (table data) and user_management.db in the current directory"""
+    cols = {}
+    for dtype, count in zip(TYPES, (args.int_cols, args.real_cols, args.text_cols, args.blob_cols)):
+        for i in range(count):
+            cols[f"{dtype.lower()}_{i}"] = dtype
+    makers = {
+        'INTEGER': lambda: rng.randrange(1_000_000),
+        'REAL': lambda: rng.random() * 1000,
+        'TEXT': lambda: ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randrange(4, 24))),
+        'BLOB': lambda: rng.getrandbits(8 * args.blob_size).to_bytes(args.blob_size, 'little'),
+    }
+    row_makers = [makers[dtype] for dtype in cols.values()]
+
+    db = core.DB('bench')
+    db.create_table('data', cols)
+    remaining = args.rows
+    while remaining:
+        batch = [[make() for make in row_makers] for _ in range(min(remaining, core.IMPORT_BATCH))]
+        db.insert_many('data', cols, batch)
+        remaining -= len(batch)
+    db.close()
+
+    core.init_user_db()
+    conn = core.pool.get(core.USER_DB)
+    users = [f"user{i}" for i in range(args.users)]
+    conn.executemany("INSERT OR IGNORE INTO users VALUES (?, ?)", [(user, 'x') for user in users])
+    grants = {(f"db{rng.randrange(max(args.permissions // 10, 1))}", rng.choice(users))
+              for _ in range(args.permissions)}
+    conn.executemany("INSERT OR IGNORE INTO permissions (db_name, username, created_by) VALUES (?, ?, ?)",
+                     [(name, user, user) for name, user in grants])
+    conn.commit()
+    return cols, users
+
+
+def measure(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'runs': repeat}
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    cols, users = generate(args, rng)
+    db = core.DB('bench')
+    sample = {col: (b'x' * args.blob_size if dtype == 'BLOB' else '1') for col, dtype in cols.items()}
+    results = {}
+
+    def inserts():
+        for _ in range(args.inserts):
+            db.insert('data', sample)
+
+    results['insert'] = measure(inserts, args.repeat)
+    results['fetch_all'] = measure(lambda: db.fetch_all('data'), args.repeat)
+    page = lambda: db.fetch_page('data', after=(args.rows // 2,))
+    results['fetch_page'] = measure(page, args.repeat, setup=core.page_cache.invalidate)
+    results['fetch_page_cached'] = measure(page, args.repeat)
+    out = os.path.abspath('bench_export.csv')
+    results['export_csv'] = measure(lambda: db.export_csv('data', out), args.repeat)
+
+    def copy_table():
+        db.c.execute("DROP TABLE IF EXISTS scratch")
+        db.c.execute("CREATE TABLE scratch AS SELECT * FROM data")
+        db.conn.commit()
+
+    keys = [(rowid,) for rowid in rng.sample(range(1, args.rows + 1), min(args.deletes, args.rows))]
+    results['delete_many'] = measure(lambda: db.delete_many('scratch', ['rowid'], keys), args.repeat,
+                                     setup=copy_table)
+
+    lookups = rng.choices(users, k=args.lookups)
+
+    def user_dbs():
+        core.clear_permission_cache()
+        for user in lookups:
+            core.get_user_dbs(user)
+
+    results['get_user_dbs'] = measure(user_dbs, args.repeat)
+    results['table_view_open'] = bench_table_view(db, args.repeat)
+    db.close()
+    return results
+
+
+def bench_table_view(db, repeat):
+    """Time opening the paged Treeview on the data table; skipped without a display"""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        import APP
+        root = tk.Tk()
+    except Exception as e:
+        return {'skipped': str(e)}
+    root.withdraw()
+    cols = db.get_columns('data')
+    tree = ttk.Treeview(root, columns=cols, show='headings')
+    scrollbar = ttk.Scrollbar(root, command=tree.yview)
+    pager = APP.PagedTree(tree, scrollbar, lambda done, failed, **cursor: done(db.fetch_page('data', **cursor)))
+
+    def open_view():
+        pager.load()
+        root.update()
+
+    result = measure(open_view, repeat, setup=core.page_cache.invalidate)
+    root.destroy()
+    return result
+
+
+def compare(results, baseline, threshold, floor=0.001):
+    """Print a comparison table and return the names of benchmarks that got slower.
+
+    Uses the fastest run, which is far less noisy than the median, and ignores
+    differences under `floor` seconds.
+    """
+    slower = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if 'min' not in result or not base or 'min' not in base:
+            print(f"{name:16} skipped")
+            continue
+        ratio = result['min'] / base['min'] if base['min'] else 1.0
+        flag = ''
+        if ratio > 1 + threshold and result['min'] - base['min'] > floor:
+            flag = '  SLOWER'
+            slower.append(name)
+        print(f"{name:16} {base['min'] * 1000:10.2f}ms -> {result['min'] * 1000:10.2f}ms "
+              f"({ratio:5.2f}x){flag}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--int-cols', type=int, default=2)
+    parser.add_argument('--real-cols', type=int, default=1)
+    parser.add_argument('--text-cols', type=int, default=2)
+    parser.add_argument('--blob-cols', type=int, default=0)
+    parser.add_argument('--blob-size', type=int, default=1024, help="bytes per BLOB value")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--permissions', type=int, default=10000)
+    parser.add_argument('--inserts', type=int, default=200, help="single-row DB.insert calls per run")
+    parser.add_argument('--deletes', type=int, default=1000, help="rows deleted per run")
+    parser.add_argument('--lookups', type=int, default=500, help="get_user_dbs calls per run")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp(prefix='sgbdr-bench-')
+    os.chdir(directory)
+    try:
+        results = run(args)
+    finally:
+        core.pool.close_all()
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+    report = {
+        'meta': {
+            'options': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'threshold')},
+            'python': platform.python_version(),
+            'sqlite': core.sql.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('options') != report['meta']['options']:
+            print("warning: baseline was run with different options", file=sys.stderr)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    if not args.output:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
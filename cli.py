@@ -0,0 +1,224 @@
+"""Command line access to the DB Manager data layer, for scripts and headless servers.
+
+    python cli.py tables school
+    python cli.py export school etudiants -o etudiants.csv.gz --gzip --where "Filiere = 'IAGI'"
+    python cli.py import school etudiants etudiants.csv
+    python cli.py query school "SELECT * FROM etudiants WHERE CNE = ?" 001
+    python cli.py stats school etudiants
+    python cli.py index school etudiants
+    python cli.py search school "casa"
+    python cli.py grant school karim --by ziyad
+    python cli.py revoke school karim
+    python cli.py vacuum school
+    python cli.py backup school --keep 14     # e.g. from cron
+    python cli.py backups school
+    python cli.py restore school backups/school/20250101-020000-000000.db
+
+Database names are given without the .db suffix, as in the app, and are
+resolved against the current directory. Only import and query create a
+database that does not exist yet.
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+import core
+
+
+def open_db(name):
+    """DB for an existing database; core.DB would create a missing file"""
+    if not os.path.exists(name + '.db'):
+        raise FileNotFoundError(f"No database {name}")
+    return core.DB(name)
+
+
+def cmd_tables(args):
+    db = open_db(args.db)
+    for table in db.get_tables():
+        print(table)
+
+
+def cmd_export(args):
+    db = open_db(args.db)
+    columns = args.columns.split(',') if args.columns else None
+    rows = db.export_csv(args.table, args.output, columns, args.where, compress=args.gzip)
+    print(f"{rows} rows exported", file=sys.stderr)
+
+
+def cmd_import(args):
+    db = core.DB(args.db)
+    result = db.import_csv(args.table, args.file)
+    print(f"{result['rows']} rows in {result['seconds']:.2f}s ({result['rows_per_sec']:.0f} rows/s)",
+          file=sys.stderr)
+    for line, reason in result['rejected']:
+        print(f"rejected line {line}: {reason}", file=sys.stderr)
+
+
+def csv_field(value):
+    """Write a value the way export_csv writes BLOB columns, so import reads it back"""
+    if isinstance(value, bytes):
+        return f"\\x{value.hex().upper()}"
+    if isinstance(value, str) and value.startswith('\\'):
+        return '\\' + value
+    return value
+
+
+def cmd_query(args):
+    db = core.DB(args.db)
+    cur = db.conn.cursor()
+    core.run_write(db.conn, cur.execute, args.sql, args.params)
+    if cur.description is None:
+        db.conn.commit()
+        print(f"{cur.rowcount} rows affected", file=sys.stderr)
+        return
+    writer = csv.writer(sys.stdout)
+    writer.writerow([desc[0] for desc in cur.description])
+    while True:
+        rows = cur.fetchmany(core.EXPORT_BATCH)
+        if not rows:
+            break
+        writer.writerows([csv_field(v) for v in row] for row in rows)
+
+
+def cmd_stats(args):
+    stats = open_db(args.db).column_stats(args.table)
+    print(f"{stats['rows']} rows")
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['column', 'type', 'nulls', 'distinct', 'min', 'max', 'avg', 'most common'])
+    for col, st in stats['columns'].items():
+        common = ' '.join(f"{value}({count})" for value, count in st['top'])
+        writer.writerow([col, st['type'], st['nulls'], st['distinct'], st['min'], st['max'], st['avg'], common])
+
+
+def cmd_index(args):
+    db = open_db(args.db)
+    if args.drop:
+        db.drop_fts(args.table)
+    else:
+        db.create_fts(args.table)
+
+
+def cmd_search(args):
+    for hit in open_db(args.db).search(args.text, args.limit):
+        print(f"{hit['table']}\t{hit['rowid']}\t{hit['snippet']}")
+
+
+def cmd_grant(args):
+    core.init_user_db()
+    if not core.add_permission(args.db, args.user, args.by):
+        print(f"{args.user} already has access to {args.db}", file=sys.stderr)
+
+
+def cmd_revoke(args):
+    core.init_user_db()
+    core.revoke_permission(args.db, args.user)
+
+
+def cmd_vacuum(args):
+    open_db(args.db).vacuum()
+
+
+def cmd_backup(args):
+    path = core.backup_db(args.db, keep=args.keep)
+    print(path)
+
+
+def cmd_backups(args):
+    for path, size, mtime in core.list_backups(args.db):
+        print(f"{path}\t{size}\t{datetime.fromtimestamp(mtime):%Y-%m-%d %H:%M:%S}")
+
+
+def cmd_restore(args):
+    core.restore_db(args.db, args.snapshot)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('tables', help="list tables")
+    p.add_argument('db')
+    p.set_defaults(func=cmd_tables)
+
+    p = sub.add_parser('export', help="export a table to CSV")
+    p.add_argument('db')
+    p.add_argument('table')
+    p.add_argument('-o', '--output', help="output file (default: <table>.csv)")
+    p.add_argument('--columns', help="comma separated columns to export")
+    p.add_argument('--where', help="SQL condition selecting the rows to export")
+    p.add_argument('--gzip', action='store_true', help="gzip the output")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('import', help="bulk import a CSV file")
+    p.add_argument('db')
+    p.add_argument('table')
+    p.add_argument('file')
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('query', help="run SQL, printing any result rows as CSV")
+    p.add_argument('db')
+    p.add_argument('sql')
+    p.add_argument('params', nargs='*', help="values for ? placeholders")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('stats', help="print column statistics of a table")
+    p.add_argument('db')
+    p.add_argument('table')
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('index', help="build a full-text search index of a table")
+    p.add_argument('db')
+    p.add_argument('table')
+    p.add_argument('--drop', action='store_true', help="remove the index instead")
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser('search', help="full-text search the indexed tables of a database")
+    p.add_argument('db')
+    p.add_argument('text')
+    p.add_argument('--limit', type=int, default=core.SEARCH_LIMIT)
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser('grant', help="give a user access to a database")
+    p.add_argument('db')
+    p.add_argument('user')
+    p.add_argument('--by', default='admin', help="user recorded as granting access")
+    p.set_defaults(func=cmd_grant)
+
+    p = sub.add_parser('revoke', help="remove a user's access to a database")
+    p.add_argument('db')
+    p.add_argument('user')
+    p.set_defaults(func=cmd_revoke)
+
+    p = sub.add_parser('vacuum', help="rebuild a database file to reclaim space")
+    p.add_argument('db')
+    p.set_defaults(func=cmd_vacuum)
+
+    p = sub.add_parser('backup', help="snapshot a database while it is in use")
+    p.add_argument('db')
+    p.add_argument('--keep', type=int, default=core.BACKUP_KEEP, help="snapshots to keep")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser('backups', help="list the snapshots of a database")
+    p.add_argument('db')
+    p.set_defaults(func=cmd_backups)
+
+    p = sub.add_parser('restore', help="replace a database with a snapshot")
+    p.add_argument('db')
+    p.add_argument('snapshot')
+    p.set_defaults(func=cmd_restore)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except (core.sql.Error, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        core.pool.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1566 @@
+"""Data layer of the DB Manager: pooled connections, the DB wrapper, users and permissions.
+
+Nothing here imports tkinter or touches the disk at import time, so it can
+be used from scripts, cron jobs and cli.py as well as from APP.py.
+"""
+import sqlite3 as sql
+import csv
+import gzip
+import functools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from itertools import chain, islice
+
+USER_DB = "user_management.db"
+
+# Paging
+PAGE_SIZE = 200      # rows fetched per query
+USER_PAGE_SIZE = 25  # users per page on the sharing screen
+EXPORT_BATCH = 5000  # rows per fetchmany() during CSV export
+EXPORT_BLOB_BATCH = 50  # rows per fetchmany() when exporting tables with BLOB columns
+BLOB_CHUNK = 64 * 1024  # bytes per read/write when copying BLOBs to or from files
+PAGE_CACHE_BYTES = 32 * 1024 * 1024  # memory cap of the fetched page cache
+STATS_TOP_K = 5      # most common values listed per column in the statistics
+
+# Bulk CSV import
+IMPORT_BATCH = 50000  # rows per executemany() and transaction
+IMPORT_SAMPLE = 1000  # rows sampled to infer column types
+IMPORT_MAX_REJECTED = 1000  # rejected lines kept for the report
+IMPORT_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -200000,  # KiB
+}
+
+# Applied once to every pooled connection
+STATEMENT_CACHE = 256  # prepared statements kept per connection
+PRAGMAS = {
+    'cache_size': -16000,  # KiB
+    'temp_store': 'MEMORY',
+}
+
+# Storage profiles, chosen per database on the maintenance screen and applied on every open
+STORAGE_PROFILES = {
+    'default': {'cache_size': -16000, 'mmap_size': 0},
+    'large': {'cache_size': -262144, 'mmap_size': 1 << 30},  # 256 MiB cache, 1 GiB memory map
+    'low memory': {'cache_size': -2000, 'mmap_size': 0},
+}
+NEW_DB_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',  # only possible before the first table is created
+}
+
+# Concurrent access: in WAL mode readers and one writer don't block each other
+WAL_MODE = True
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+BUSY_TIMEOUT = 5.0       # seconds SQLite waits on a locked database
+WRITE_RETRIES = 6        # attempts for a write that still finds the database locked
+RETRY_DELAY = 0.05       # first backoff delay in seconds, doubled on each retry
+CHECKPOINT_INTERVAL_MS = 60000
+
+# Full-text search
+FTS_PREFIX = "_fts_"     # FTS5 index of table t is _fts_t, hidden from the table list
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+SEARCH_LIMIT = 50        # hits returned by a database-wide search
+
+# Backups
+BACKUP_DIR = "backups"   # snapshots go to BACKUP_DIR/<db name>/
+BACKUP_PAGES = 1024      # pages copied per backup step
+BACKUP_PAUSE = 0.005     # seconds between steps, leaving the disk to foreground work
+BACKUP_KEEP = 7          # snapshots kept per database
+BACKUP_INTERVAL_MS = 6 * 3600 * 1000  # scheduled snapshots in the app
+
+# Query tracing
+TRACE = True
+TRACE_SIZE = 5000        # statements kept for the latency percentiles
+SLOW_QUERY_MS = 100      # statements slower than this go to the slow query log
+SLOW_QUERY_LOG = "slow_queries.log"
+SLOW_QUERY_PLAN = True   # add EXPLAIN QUERY PLAN output to slow SELECTs
+SLOW_QUERY_PARAMS = False  # log bind parameters too; they include passwords and cell values
+
+
+def _is_locked(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def run_write(conn, fn, *args, **kwargs):
+    """Run a write transaction on conn, retrying with backoff while the database is locked"""
+    delay = RETRY_DELAY
+    for attempt in range(WRITE_RETRIES):
+        try:
+            return fn(*args, **kwargs)
+        except sql.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            conn.rollback()
+            if attempt == WRITE_RETRIES - 1:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+
+
+def retry_locked(method):
+    """run_write a DB method on its own connection, unless it runs inside DB.transaction()"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.depth:
+            return method(self, *args, **kwargs)  # the transaction already holds the write lock
+        return run_write(self.conn, method, self, *args, **kwargs)
+    return wrapper
+
+
+def retry_user_db(fn):
+    """run_write a user_management helper on the USER_DB connection, holding it exclusively"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with user_db() as conn:
+            return run_write(conn, fn, *args, **kwargs)
+    return wrapper
+
+
+current_screen = ContextVar('current_screen', default=None)  # screen name recorded with each trace
+
+
+def _is_query(statement):
+    return statement.lstrip()[:6].upper().startswith(('SELECT', 'WITH'))
+
+
+class Trace:
+    """Timing of one SQL statement (or other traced operation)"""
+    __slots__ = ('op', 'screen', 'query', 'params', 'seconds', 'rows', 'started', 'done')
+
+    def __init__(self, op, query=None, params=(), seconds=0.0, rows=None):
+        self.op = op
+        self.screen = current_screen.get()
+        self.query = query
+        self.params = params
+        self.seconds = seconds
+        self.rows = rows
+        self.started = time.time()
+        self.done = False
+
+
+class Tracer:
+    """Keeps recent traces, counts opened connections and writes the slow query log"""
+
+    def __init__(self, size=TRACE_SIZE):
+        self.traces = deque(maxlen=size)
+        self.slow = deque(maxlen=100)
+        self.connects = deque(maxlen=size)  # time.monotonic() of each opened connection
+        self.connects_total = 0
+        self.slow_ms = SLOW_QUERY_MS
+        self.explain = SLOW_QUERY_PLAN
+        self.log_params = SLOW_QUERY_PARAMS
+        self.log_path = SLOW_QUERY_LOG
+        self.lock = threading.Lock()
+
+    def add(self, op, query=None, params=(), seconds=0.0, rows=None):
+        trace = Trace(op, query, params, seconds, rows)
+        self.traces.append(trace)
+        return trace
+
+    @contextmanager
+    def span(self, op, rows=None):
+        """Trace a block of non-SQL work, such as filling a Treeview"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.finish(self.add(op, seconds=time.perf_counter() - start, rows=rows))
+
+    def finish(self, trace, conn=None):
+        """Mark trace complete and log it if it was slow"""
+        if trace.done:
+            return
+        trace.done = True
+        params, trace.params = trace.params, ()  # not kept around: they may hold passwords or BLOBs
+        if trace.seconds * 1000 < self.slow_ms:
+            return
+        self.slow.append(trace)
+        if not self.log_path:
+            return
+        lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace.started))} "
+                 f"{trace.seconds * 1000:.1f}ms [{trace.screen or '-'}] {trace.op} rows={trace.rows}"]
+        if trace.query:
+            lines.append(f"    {' '.join(trace.query.split())}")
+            if params and self.log_params:
+                lines.append(f"    params: {params!r}"[:500])
+            if self.explain and conn is not None and _is_query(trace.query):
+                try:
+                    plan = sql.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {trace.query}", params)
+                    lines += [f"    plan: {row[3]}" for row in plan]
+                except (sql.Error, ValueError):
+                    pass
+        with self.lock:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+    def connected(self):
+        with self.lock:
+            self.connects.append(time.monotonic())
+            self.connects_total += 1
+
+    def connections(self, window=60):
+        """Connections opened in the last window seconds"""
+        since = time.monotonic() - window
+        with self.lock:
+            return sum(1 for t in self.connects if t >= since)
+
+    def stats(self):
+        """Calls, rows and p50/p95/max seconds per operation over the recent traces"""
+        by_op = {}
+        for trace in list(self.traces):
+            by_op.setdefault(trace.op, []).append(trace)
+        stats = {}
+        for op, traces in by_op.items():
+            times = sorted(trace.seconds for trace in traces)
+            stats[op] = {
+                'calls': len(times),
+                'rows': sum(trace.rows or 0 for trace in traces),
+                'p50': times[(len(times) - 1) // 2],
+                'p95': times[int((len(times) - 1) * 0.95)],
+                'max': times[-1],
+            }
+        return stats
+
+    def clear(self):
+        self.traces.clear()
+        self.slow.clear()
+
+
+tracer = Tracer()
+
+
+class TracedCursor(sql.Cursor):
+    """Cursor timing each statement from execute() until its rows are fetched"""
+
+    trace = None
+
+    def execute(self, query, params=()):
+        return self.run(super().execute, query, params)
+
+    def executemany(self, query, params):
+        return self.run(super().executemany, query, params)
+
+    def run(self, method, query, params):
+        self.done()
+        frame = sys._getframe(1)
+        while frame.f_code in _TRACE_FRAMES:
+            frame = frame.f_back
+        keep = method.__name__ == 'execute' and _is_query(query)  # only queries are EXPLAINed
+        trace = self.trace = tracer.add(frame.f_code.co_name, query, params if keep else ())
+        start = time.perf_counter()
+        try:
+            method(query, params)
+        finally:
+            trace.seconds = time.perf_counter() - start
+            if self.description is None:
+                trace.rows = max(self.rowcount, 0)
+                self.done()
+        return self
+
+    def fetched(self, start, rows, last):
+        trace = self.trace
+        if trace is not None:
+            trace.seconds += time.perf_counter() - start
+            trace.rows = (trace.rows or 0) + rows
+            if last:
+                self.done()
+
+    def done(self):
+        trace, self.trace = self.trace, None
+        if trace is not None:
+            tracer.finish(trace, self.connection)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        size = self.arraysize if size is None else size
+        rows = super().fetchmany(size)
+        self.fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.fetched(start, 0, True)
+            raise
+        self.fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self.done()
+        super().close()
+
+    def __del__(self):
+        self.done()
+
+
+class TracedConnection(sql.Connection):
+    """Connection whose cursors, including those of execute(), are TracedCursors"""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, params):
+        return self.cursor().executemany(query, params)
+
+
+# Wrapper frames skipped when naming the operation that ran a statement
+_TRACE_FRAMES = {f.__code__ for f in (TracedCursor.execute, TracedCursor.executemany,
+                                      TracedConnection.execute, TracedConnection.executemany)}
+
+
+class SchemaCache:
+    """Tables, columns, keys, indexes and row estimates of one database file
+
+    Entries stay valid for as long as PRAGMA schema_version is unchanged.
+    Table details are loaded the first time they are asked for.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.tables = {}  # name -> info dict, or None until loaded
+        self.stats = {}  # name -> (data token, column statistics)
+        self.fts = set()  # names of tables with a full-text index
+        self.lock = threading.Lock()
+
+    def check(self, conn):
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if version != self.version:
+            rows = conn.execute("SELECT name, sql FROM sqlite_master "
+                                "WHERE type='table' AND name NOT LIKE 'sqlite_%'").fetchall()
+            self.tables = {name: None for name, _ in rows if not name.startswith(FTS_PREFIX)}
+            self.fts = {name[len(FTS_PREFIX):] for name, create in rows
+                        if name.startswith(FTS_PREFIX) and create.upper().startswith('CREATE VIRTUAL')}
+            self.stats = {}
+            self.version = version
+
+    def table_names(self, conn):
+        with self.lock:
+            self.check(conn)
+            return list(self.tables)
+
+    def fts_tables(self, conn):
+        with self.lock:
+            self.check(conn)
+            return set(self.fts)
+
+    def table(self, conn, name):
+        """Return the info dict of table name"""
+        with self.lock:
+            self.check(conn)
+            info = self.tables.get(name)
+            if info is None:
+                info = self.load_table(conn, name)
+                if name in self.tables:
+                    self.tables[name] = info
+            return info
+
+    def load_table(self, conn, name):
+        cols = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+        pk = [col[1] for col in sorted(cols, key=lambda col: col[5]) if col[5]]
+        try:
+            conn.execute(f'SELECT rowid FROM "{name}" LIMIT 0')
+            key = ['rowid']
+        except sql.OperationalError:
+            key = pk
+        indexes = {}
+        for index in conn.execute(f'PRAGMA index_list("{name}")').fetchall():
+            indexes[index[1]] = [row[2] for row in conn.execute(f'PRAGMA index_info("{index[1]}")')]
+        return {
+            'columns': [col[1] for col in cols],
+            'types': {col[1]: col[2].upper() for col in cols},
+            'pk': pk,
+            'key': key,
+            'indexes': indexes,
+            'rows': self.estimate_rows(conn, name, key),
+        }
+
+    @staticmethod
+    def estimate_rows(conn, name, key):
+        """Row count from ANALYZE statistics, or max(rowid) when there are none"""
+        try:
+            row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ?", (name,)).fetchone()
+            if row:
+                return int(row[0].split()[0])
+        except sql.OperationalError:
+            pass
+        if key == ['rowid']:
+            return conn.execute(f'SELECT max(rowid) FROM "{name}"').fetchone()[0] or 0
+        return None
+
+    def update(self, conn, name, exists=True):
+        """Record a schema change to table name made through conn"""
+        with self.lock:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            if self.version is not None and version == self.version + 1:
+                if exists:
+                    self.tables[name] = None
+                else:
+                    self.tables.pop(name, None)
+                    self.fts.discard(name)
+                self.stats.pop(name, None)
+                self.version = version
+            else:
+                self.version = None  # changed elsewhere too: reload on next use
+
+    def invalidate(self):
+        with self.lock:
+            self.version = None
+
+    def cached_stats(self, name, token):
+        """Statistics of table name if computed at data token, else None"""
+        with self.lock:
+            entry = self.stats.get(name)
+            return entry[1] if entry and entry[0] == token else None
+
+    def store_stats(self, name, token, stats):
+        with self.lock:
+            if name in self.tables:
+                self.stats[name] = (token, stats)
+
+
+class PageCache:
+    """LRU cache of fetched pages, bounded by an estimate of their memory use
+
+    Entries are stored with the data token of their database (see
+    DB.data_token) and all entries of a database are dropped once its token
+    changes, i.e. after any write by this or another connection.
+    """
+
+    def __init__(self, max_bytes=PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.pages = OrderedDict()  # (path, ...) -> (rows, size)
+        self.tokens = {}  # path -> data token the cached pages were read at
+        self.size = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, token):
+        with self.lock:
+            self.check(key[0], token)
+            entry = self.pages.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, token, rows):
+        size = sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in rows)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.check(key[0], token)
+            old = self.pages.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.pages[key] = (rows, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.pages.popitem(last=False)
+                self.size -= evicted
+
+    def check(self, path, token):
+        if self.tokens.get(path) != token:
+            self.drop(path)
+            self.tokens[path] = token
+
+    def drop(self, path):
+        for key in [key for key in self.pages if key[0] == path]:
+            self.size -= self.pages.pop(key)[1]
+        self.tokens.pop(path, None)
+
+    def invalidate(self, path=None):
+        """Forget the pages of path, or of every database"""
+        with self.lock:
+            if path is None:
+                self.pages.clear()
+                self.tokens.clear()
+                self.size = 0
+            else:
+                self.drop(path)
+
+
+page_cache = PageCache()
+
+
+class ConnectionPool:
+    """Keeps one long-lived connection (and schema cache) per database file"""
+
+    def __init__(self):
+        self.conns = {}
+        self.schemas = {}
+        self.lock = threading.RLock()  # reentrant: opening a database reads its profile from USER_DB
+
+    def get(self, path):
+        """Return the shared connection for path, opening it on first use"""
+        conn = self.conns.get(path)
+        if conn is not None:
+            return conn
+        with self.lock:
+            conn = self.conns.get(path)
+            if conn is None:
+                with tracer.span('connect'):
+                    new = not os.path.exists(path)
+                    conn = sql.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                       cached_statements=STATEMENT_CACHE,
+                                       factory=TracedConnection if TRACE else sql.Connection)
+                    pragmas = {**NEW_DB_PRAGMAS} if new else {}
+                    pragmas.update(PRAGMAS)
+                    if WAL_MODE:
+                        pragmas.update(WAL_PRAGMAS)
+                    if path != USER_DB:
+                        pragmas.update(STORAGE_PROFILES[get_profile(path[:-3])])
+                    for pragma, value in pragmas.items():
+                        conn.execute(f"PRAGMA {pragma} = {value}")
+                tracer.connected()
+                self.conns[path] = conn
+            return conn
+
+    def schema(self, path):
+        """Return the SchemaCache for path"""
+        with self.lock:
+            return self.schemas.setdefault(path, SchemaCache())
+
+    def close(self, path):
+        """Close the connection for path, if open"""
+        with self.lock:
+            conn = self.conns.pop(path, None)
+            self.schemas.pop(path, None)
+        page_cache.invalidate(path)
+        if conn is not None:
+            self.optimize_and_close(conn)
+
+    def checkpoint(self):
+        """Copy WAL content back into every open database without blocking other users"""
+        with self.lock:
+            conns = list(self.conns.values())
+        for conn in conns:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def interrupt(self, path):
+        """Abort the statement currently running on path's connection"""
+        with self.lock:
+            conn = self.conns.get(path)
+        if conn is not None:
+            conn.interrupt()
+
+    def close_all(self):
+        """Close every pooled connection"""
+        with self.lock:
+            conns = list(self.conns.values())
+            self.conns.clear()
+            self.schemas.clear()
+        page_cache.invalidate()
+        for conn in conns:
+            self.optimize_and_close(conn)
+
+    @staticmethod
+    def optimize_and_close(conn):
+        try:
+            conn.execute("PRAGMA optimize")  # refreshes planner statistics that have gone stale
+        except sql.Error:
+            pass
+        conn.close()
+
+
+pool = ConnectionPool()
+_user_db_lock = threading.RLock()
+
+
+@contextmanager
+def user_db():
+    """The shared USER_DB connection, held so that threads' transactions on it don't interleave
+
+    A rollback on a connection undoes whatever is uncommitted on it, whichever
+    thread wrote it, so every USER_DB helper runs under this lock.
+    """
+    conn = pool.get(USER_DB)
+    with _user_db_lock:
+        yield conn
+
+
+# Permission lookups, checked against USER_DB's data version so that grants and
+# revokes from other app instances show up; add/revoke here also drop entries
+_user_dbs = {}  # username -> (token, [{"name", "creator"}])
+_db_users = {}  # db_name -> (token, set of usernames)
+_perm_lock = threading.Lock()
+
+
+def _user_db_token(conn):
+    """Changes whenever USER_DB may have changed, like DB.data_token"""
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+def clear_permission_cache():
+    with _perm_lock:
+        _user_dbs.clear()
+        _db_users.clear()
+
+
+def init_user_db():
+    """Initialize user database"""
+    with user_db() as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (
+                         username TEXT PRIMARY KEY,
+                         password TEXT NOT NULL
+                     )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS permissions
+                     (
+                         id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                         db_name    TEXT,
+                         username   TEXT,
+                         created_by TEXT,
+                         UNIQUE (db_name, username)
+                     )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_permissions_username ON permissions (username)")
+        c.execute('''CREATE TABLE IF NOT EXISTS db_settings
+                     (
+                         db_name TEXT PRIMARY KEY,
+                         profile TEXT NOT NULL
+                     )''')
+        c.execute("INSERT OR IGNORE INTO users VALUES (?, ?)", ("admin", "test"))
+        conn.commit()
+
+
+def login(username, password):
+    """Check login credentials"""
+    with user_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT password FROM users WHERE username = ?", (username,))
+        result = c.fetchone()
+        return result and result[0] == password
+
+
+@retry_user_db
+def create_user(username, password):
+    """Create new user"""
+    conn = pool.get(USER_DB)
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        conn.commit()
+        return True
+    except sql.IntegrityError:
+        conn.rollback()
+        return False
+
+
+def get_user_dbs(username):
+    """Get databases user can access"""
+    with user_db() as conn:
+        token = _user_db_token(conn)
+        with _perm_lock:
+            cached = _user_dbs.get(username)
+        if cached is not None and cached[0] == token:
+            return list(cached[1])
+        c = conn.cursor()
+        c.execute("SELECT db_name, created_by FROM permissions WHERE username = ?", (username,))
+        dbs = [{"name": row[0], "creator": row[1]} for row in c.fetchall()]
+    with _perm_lock:
+        _user_dbs[username] = (token, dbs)
+    return list(dbs)
+
+
+@retry_user_db
+def add_permission(db_name, username, created_by):
+    """Grant database access to user"""
+    conn = pool.get(USER_DB)
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO permissions (db_name, username, created_by) VALUES (?, ?, ?)",
+                  (db_name, username, created_by))
+        conn.commit()
+        _forget_permission(db_name, username)
+        return True
+    except sql.IntegrityError:
+        conn.rollback()
+        return False
+
+
+def get_profile(db_name):
+    """Storage profile of a database ('default' unless set on the maintenance screen)"""
+    if not os.path.exists(USER_DB):
+        return 'default'
+    try:
+        with user_db() as conn:
+            row = conn.execute("SELECT profile FROM db_settings WHERE db_name = ?", (db_name,)).fetchone()
+    except sql.OperationalError:  # user database from before db_settings existed
+        return 'default'
+    return row[0] if row and row[0] in STORAGE_PROFILES else 'default'
+
+
+@retry_user_db
+def _store_profile(db_name, profile):
+    conn = pool.get(USER_DB)
+    conn.execute("INSERT OR REPLACE INTO db_settings (db_name, profile) VALUES (?, ?)", (db_name, profile))
+    conn.commit()
+
+
+def set_profile(db_name, profile):
+    """Store the storage profile of a database and apply it to its open connection"""
+    _store_profile(db_name, profile)
+    with pool.lock:  # not under the USER_DB lock: pool.get takes the two in the other order
+        db_conn = pool.conns.get(db_name + '.db')
+    if db_conn is not None:
+        for pragma, value in STORAGE_PROFILES[profile].items():
+            db_conn.execute(f"PRAGMA {pragma} = {value}")
+
+
+def get_all_users():
+    """Get all usernames"""
+    with user_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT username FROM users")
+        users = [row[0] for row in c.fetchall()]
+        return users
+
+
+def search_users(pattern='', after=None, limit=USER_PAGE_SIZE, exclude=None):
+    """Get a page of usernames containing pattern, in username order"""
+    with user_db() as conn:
+        c = conn.cursor()
+        c.execute("SELECT username FROM users WHERE username LIKE ? ESCAPE '\\' "
+                  "AND username > ? AND username IS NOT ? ORDER BY username LIMIT ?",
+                  (f"%{_like_escape(pattern)}%", after or '', exclude, limit))
+        return [row[0] for row in c.fetchall()]
+
+
+def get_db_users(db_name):
+    """Get users with access to database"""
+    with user_db() as conn:
+        token = _user_db_token(conn)
+        with _perm_lock:
+            cached = _db_users.get(db_name)
+        if cached is not None and cached[0] == token:
+            return set(cached[1])
+        c = conn.cursor()
+        c.execute("SELECT username FROM permissions WHERE db_name = ?", (db_name,))
+        users = {row[0] for row in c.fetchall()}
+    with _perm_lock:
+        _db_users[db_name] = (token, users)
+    return set(users)
+
+
+@retry_user_db
+def revoke_permission(db_name, username):
+    """Remove user access"""
+    conn = pool.get(USER_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM permissions WHERE db_name = ? AND username = ?", (db_name, username))
+    conn.commit()
+    _forget_permission(db_name, username)
+
+
+@retry_user_db
+def revoke_all_permissions(db_name):
+    """Remove every user's access to a (deleted) database"""
+    conn = pool.get(USER_DB)
+    c = conn.cursor()
+    c.execute("DELETE FROM permissions WHERE db_name = ?", (db_name,))
+    conn.commit()
+    clear_permission_cache()
+
+
+def _forget_permission(db_name, username):
+    with _perm_lock:
+        _user_dbs.pop(username, None)
+        _db_users.pop(db_name, None)
+
+
+def is_blob(dtype):
+    """True for columns whose values are stored as-is (declared BLOB or with no type)"""
+    return 'BLOB' in dtype or not dtype
+
+
+def _blob_case(col, expr):
+    """SQL giving expr for BLOB values of col and the value itself otherwise"""
+    return f"""CASE WHEN typeof("{col}") = 'blob' THEN {expr} ELSE "{col}" END"""
+
+
+def _blob_field(col):
+    """SQL writing a value of BLOB column col as a CSV field that _from_blob_field reads back
+
+    BLOBs become hex after a \\x marker. Text starting with a backslash gets
+    one more, so it can't be mistaken for a marked BLOB.
+    """
+    return (f"""CASE typeof("{col}") WHEN 'blob' THEN '\\x' || hex("{col}") """
+            f"""WHEN 'text' THEN CASE WHEN substr("{col}", 1, 1) = '\\' THEN '\\' || "{col}" ELSE "{col}" END """
+            f"""ELSE "{col}" END""")
+
+
+def _hex_marked(value):
+    """The bytes of a \\x-marked hex field, or None if value isn't one"""
+    if not value.startswith('\\x'):
+        return None
+    try:
+        return bytes.fromhex(value[2:])
+    except ValueError:
+        return None
+
+
+def _from_blob_field(value):
+    """Read back a field written by _blob_field; other text is kept as it is"""
+    data = _hex_marked(value)
+    if data is not None:
+        return data
+    return value[1:] if value.startswith('\\\\') else value
+
+
+def _converter(dtype):
+    """Return the function turning a CSV field into a value for a column of dtype"""
+    if is_blob(dtype):
+        return _from_blob_field
+    if 'INT' in dtype:
+        return int
+    if any(t in dtype for t in ('REAL', 'FLOA', 'DOUB')):
+        return float
+    return str
+
+
+# Fields infer_types reads as numbers. Anything int()/float() would change on the
+# way in stays TEXT: leading zeros (codes, zip codes), '1_000', ' 5', nan and inf.
+_INTEGER_FIELD = re.compile(r'-?(0|[1-9][0-9]{0,17})')  # fits SQLite's 64-bit integers
+_REAL_FIELD = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+
+
+def infer_types(header, sample):
+    """Guess INTEGER/REAL/TEXT for each CSV column from sample rows, or BLOB if it has marked hex"""
+    types = {}
+    for i, col in enumerate(header):
+        values = [row[i] for row in sample if i < len(row) and row[i] != '']
+        if any(_hex_marked(v) is not None for v in values):
+            types[col] = 'BLOB'
+            continue
+        dtype = 'TEXT'
+        for candidate, pattern in (('INTEGER', _INTEGER_FIELD), ('REAL', _REAL_FIELD)):
+            if values and all(pattern.fullmatch(v) for v in values):
+                dtype = candidate
+                break
+        types[col] = dtype
+    return types
+
+
+class _BackupCancelled(Exception):
+    pass
+
+
+def backup_dir(name):
+    return os.path.join(BACKUP_DIR, name)
+
+
+def list_backups(name):
+    """Snapshots of database name as (path, size, mtime), newest first"""
+    directory = backup_dir(name)
+    if not os.path.isdir(directory):
+        return []
+    backups = [(entry.path, entry.stat().st_size, entry.stat().st_mtime)
+               for entry in os.scandir(directory) if entry.name.endswith('.db')]
+    return sorted(backups, reverse=True)  # file names start with the timestamp
+
+
+def prune_backups(name, keep=BACKUP_KEEP):
+    """Delete all but the newest keep snapshots of database name"""
+    for path, _, _ in list_backups(name)[keep:]:
+        os.remove(path)
+
+
+def backup_db(name, progress=None, cancel=None, keep=BACKUP_KEEP):
+    """Snapshot a live database into BACKUP_DIR; return the file path, or None if cancelled
+
+    Uses the SQLite backup API on a connection of its own, BACKUP_PAGES pages
+    per step, so the app keeps working while it runs. In WAL mode the copy
+    runs inside one read transaction: writers carry on, and their commits
+    don't restart the backup. Calls progress(done, total) in pages.
+    """
+    source = name + '.db'
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"No database {name}")
+    os.makedirs(backup_dir(name), exist_ok=True)
+    path = os.path.join(backup_dir(name), f"{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+    part = path + '.part'
+
+    def step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        if cancel is not None and cancel.is_set():
+            raise _BackupCancelled
+        if remaining:
+            time.sleep(BACKUP_PAUSE)
+
+    src = sql.connect(source, timeout=BUSY_TIMEOUT)
+    dst = sql.connect(part)
+    try:
+        try:
+            if WAL_MODE:
+                src.execute("BEGIN")
+                src.execute("SELECT count(*) FROM sqlite_master").fetchone()  # pins the snapshot
+            with tracer.span('backup'):
+                src.backup(dst, pages=BACKUP_PAGES, progress=step)
+        finally:
+            dst.close()
+            src.close()
+    except BaseException as e:
+        os.remove(part)
+        if isinstance(e, _BackupCancelled):
+            return None
+        raise
+    os.replace(part, path)
+    prune_backups(name, keep)
+    return path
+
+
+def restore_db(name, backup):
+    """Overwrite database name with a snapshot while it stays open elsewhere
+
+    The copy runs in a single backup step, so other connections see either
+    the old or the restored database, never a mix.
+    """
+    path = name + '.db'
+    src = sql.connect(backup)
+    dst = sql.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        with tracer.span('restore'):
+            src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    pool.schema(path).invalidate()
+    page_cache.invalidate(path)
+
+
+def db_summary(name):
+    """File size (including the WAL) and table count of database name, or None if it has no file
+
+    Opens a short-lived read-only connection rather than a pooled one, so
+    listing hundreds of databases neither creates missing files nor keeps a
+    connection open for each.
+    """
+    path = name + '.db'
+    if not os.path.exists(path):
+        return None
+    size = sum(os.path.getsize(f) for f in (path, path + '-wal') if os.path.exists(f))
+    conn = sql.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+    try:
+        with tracer.span('db_summary'):
+            names = conn.execute("SELECT name FROM sqlite_master "
+                                 "WHERE type='table' AND name NOT LIKE 'sqlite_%'").fetchall()
+    finally:
+        conn.close()
+    return {'size': size, 'tables': sum(1 for (table,) in names if not table.startswith(FTS_PREFIX))}
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Filter bar operators -> (SQL template, value transform)
+FILTER_OPS = {
+    'contains': ("{col} LIKE ? ESCAPE '\\'", lambda v: f"%{_like_escape(v)}%"),
+    'starts with': ("{col} LIKE ? ESCAPE '\\'", lambda v: f"{_like_escape(v)}%"),
+    '=': ("{col} = ?", str),
+    '!=': ("{col} != ?", str),
+    '<': ("{col} < ?", str),
+    '<=': ("{col} <= ?", str),
+    '>': ("{col} > ?", str),
+    '>=': ("{col} >= ?", str),
+    'is empty': ("({col} IS NULL OR {col} = '')", None),
+}
+
+
+def filter_clause(col, op, value):
+    """Build a parameterized WHERE clause for one filter bar condition"""
+    template, transform = FILTER_OPS[op]
+    return template.format(col=f'"{col}"'), [transform(value)] if transform else []
+
+
+def _keyset(cols, values, greater, nullable=False):
+    """WHERE clause for rows sorting after values when paging over cols
+
+    greater selects rows whose (cols) row value is above values. Only cols[0]
+    may be NULL (when nullable); SQLite sorts NULLs first in ascending order.
+    """
+    op = '>' if greater else '<'
+
+    def compare(names, args):
+        if not names:
+            return '0', []
+        quoted = ', '.join(f'"{name}"' for name in names)
+        marks = ', '.join('?' for _ in names)
+        return f"({quoted}) {op} ({marks})", list(args)
+
+    head = f'"{cols[0]}"'
+    if nullable and values[0] is None:
+        rest, args = compare(cols[1:], values[1:])
+        if greater:
+            return f"{head} IS NOT NULL OR ({head} IS NULL AND {rest})", args
+        return f"{head} IS NULL AND {rest}", args
+    clause, args = compare(cols, values)
+    if nullable and not greater:
+        clause = f"{clause} OR {head} IS NULL"
+    return clause, args
+
+
+class DB:
+    """Database wrapper"""
+
+    def __init__(self, name):
+        self.path = name + '.db'
+        self.conn = pool.get(self.path)
+        self.c = self.conn.cursor()
+        self.schema = pool.schema(self.path)
+        self.depth = 0  # nesting level of transaction()
+
+    @contextmanager
+    def transaction(self):
+        """Run the writes in the with block as one transaction, committed on exit
+
+        The write lock is taken up front (BEGIN IMMEDIATE, retried while the
+        database is locked), so statements inside never fail with "locked".
+        Nested blocks join the outer transaction. On an exception everything
+        is rolled back.
+        """
+        if self.depth:
+            self.depth += 1
+            try:
+                yield self
+            finally:
+                self.depth -= 1
+            return
+        run_write(self.conn, self.conn.execute, "BEGIN IMMEDIATE")
+        self.depth = 1
+        try:
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            self.schema.invalidate()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self.depth = 0
+
+    def commit(self):
+        """Commit, unless a transaction() will do it"""
+        if not self.depth:
+            self.conn.commit()
+
+    @retry_locked
+    def create_table(self, table, cols):
+        col_str = ', '.join([f'"{col}" {dtype}' for col, dtype in cols.items()])
+        self.c.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({col_str})')
+        self.commit()
+        self.schema.update(self.conn, table)
+
+    @retry_locked
+    def insert(self, table, data):
+        cols = ', '.join([f'"{col}"' for col in data.keys()])
+        vals = ', '.join(['?' for _ in data])
+        self.c.execute(f'INSERT INTO "{table}" ({cols}) VALUES ({vals})', tuple(data.values()))
+        self.commit()
+
+    @retry_locked
+    def insert_many(self, table, cols, rows):
+        """Insert rows (sequences of values for cols) with one prepared statement and commit"""
+        col_str = ', '.join(f'"{col}"' for col in cols)
+        vals = ', '.join('?' for _ in cols)
+        self.c.executemany(f'INSERT INTO "{table}" ({col_str}) VALUES ({vals})', rows)
+        self.commit()
+
+    @retry_locked
+    def update_many(self, table, key, updates):
+        """Apply (key tuple, {col: value}) updates in one transaction
+
+        Rows changing the same set of columns share one prepared statement.
+        """
+        groups = {}
+        for row_key, values in updates:
+            groups.setdefault(tuple(values), []).append([*values.values(), *row_key])
+        where = ' AND '.join(f'"{col}" = ?' for col in key)
+        for cols, rows in groups.items():
+            set_str = ', '.join(f'"{col}" = ?' for col in cols)
+            self.c.executemany(f'UPDATE "{table}" SET {set_str} WHERE {where}', rows)
+        self.commit()
+
+    @retry_locked
+    def delete_many(self, table, key, keys):
+        """Delete rows by key tuple in a single transaction"""
+        where = ' AND '.join(f'"{col}" = ?' for col in key)
+        self.c.executemany(f'DELETE FROM "{table}" WHERE {where}', keys)
+        self.commit()
+
+    def fetch_all(self, table):
+        self.c.execute(f'SELECT * FROM "{table}"')
+        return self.c.fetchall()
+
+    def table_info(self, table):
+        """Cached columns, types, pk, key, indexes and row estimate of table"""
+        return self.schema.table(self.conn, table)
+
+    def get_key_columns(self, table):
+        """Columns identifying a row: rowid, or the primary key of a WITHOUT ROWID table"""
+        return self.table_info(table)['key']
+
+    def page_query(self, table, key=('rowid',), after=None, before=None, limit=PAGE_SIZE,
+                   where=None, params=(), order=None, desc=False):
+        """Build a keyset-paginated SELECT returning (*sort, *key, *values) rows"""
+        if order and is_blob(self.table_info(table)['types'][order]):
+            raise ValueError(f"Can't sort by BLOB column {order}")  # every page would carry the values
+        sort = ([order] if order else []) + list(key)
+        forward = before is None
+        clauses, args = ([f"({where})"] if where else []), list(params)
+        cursor = before if before is not None else after
+        if cursor is not None:
+            clause, cursor_args = _keyset(sort, cursor, forward != desc, nullable=bool(order))
+            clauses.append(f"({clause})")
+            args += cursor_args
+        cols = ', '.join(f'"{col}"' for col in sort)
+        direction = 'DESC' if desc == forward else 'ASC'
+        order_by = ', '.join(f'"{col}" {direction}' for col in sort)
+        where_str = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return (f'SELECT {cols}, {self.view_columns(table)} FROM "{table}"{where_str} '
+                f'ORDER BY {order_by} LIMIT ?', args + [limit])
+
+    def view_columns(self, table):
+        """Select list for displaying rows: BLOB values become a size placeholder
+
+        length() of a BLOB is read from the record header, so the value itself
+        is never loaded.
+        """
+        return ', '.join(_blob_case(col, f"""'<BLOB ' || length("{col}") || ' bytes>'""")
+                         if is_blob(dtype) else f'"{col}"'
+                         for col, dtype in self.table_info(table)['types'].items())
+
+    def data_token(self):
+        """Value that changes whenever the database content may have changed
+
+        PRAGMA data_version only moves on commits by other connections, so
+        the rows changed through this connection (total_changes) and the
+        schema version are part of the token too.
+        """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        schema_version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+        return data_version, schema_version, self.conn.total_changes
+
+    def fetch_page(self, table, key=('rowid',), after=None, before=None, limit=PAGE_SIZE, **view):
+        """Fetch a page of (*sort, *key, *values) rows after/before a cursor tuple
+
+        Pages come from page_cache when the database hasn't changed since they
+        were read; the returned list is shared and must not be modified.
+        """
+        cache_key = (self.path, table, tuple(key), after, before, limit, view.get('where'),
+                     tuple(view.get('params') or ()), view.get('order'), view.get('desc', False))
+        token = self.data_token()
+        rows = page_cache.get(cache_key, token)
+        if rows is None:
+            self.c.execute(*self.page_query(table, key, after, before, limit, **view))
+            rows = self.c.fetchall()
+            if before is not None:
+                rows.reverse()
+            page_cache.put(cache_key, token, rows)
+        return rows
+
+    def fetch_rows(self, table, key, keys, order=None):
+        """Fetch (*sort, *key, *values) rows, shaped like fetch_page, for a list of key tuples"""
+        sort = ([order] if order else []) + list(key)
+        cols = ', '.join(f'"{col}"' for col in sort)
+        where = ' AND '.join(f'"{col}" = ?' for col in key)
+        query = f'SELECT {cols}, {self.view_columns(table)} FROM "{table}" WHERE {where}'
+        rows = []
+        for row_key in keys:
+            self.c.execute(query, row_key)
+            rows += self.c.fetchall()
+        return rows
+
+    def column_stats(self, table, top=STATS_TOP_K):
+        """Row count and per-column nulls, distinct values, min/max/avg and most common values
+
+        Counts, min/max/avg and distinct counts come from a single aggregate
+        query; the most common values need one GROUP BY per column. Results
+        are cached with the schema until the data token changes.
+        """
+        token = self.data_token()
+        stats = self.schema.cached_stats(table, token)
+        if stats is not None:
+            return stats
+        types = self.get_column_types(table)
+        aggregates = ['count(*)']
+        for col, dtype in types.items():
+            quoted = f'"{col}"'
+            aggregates += [f'count({quoted})', f'count(DISTINCT {quoted})']
+            if is_blob(dtype):
+                aggregates += ['NULL', 'NULL', 'NULL']
+                continue
+            aggregates += [f'min({quoted})', f'max({quoted})']
+            numeric = any(t in dtype for t in ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'DEC'))
+            aggregates.append(f'avg({quoted})' if numeric else 'NULL')
+        self.c.execute(f'SELECT {", ".join(aggregates)} FROM "{table}"')
+        row = self.c.fetchone()
+        rows, columns = row[0], {}
+        for i, (col, dtype) in enumerate(types.items()):
+            count, distinct, low, high, avg = row[1 + i * 5:6 + i * 5]
+            common = []
+            if top and not is_blob(dtype) and count:
+                self.c.execute(f'SELECT "{col}", count(*) FROM "{table}" WHERE "{col}" IS NOT NULL '
+                               f'GROUP BY "{col}" ORDER BY 2 DESC, 1 LIMIT ?', (top,))
+                common = self.c.fetchall()
+            columns[col] = {'type': dtype, 'nulls': rows - count, 'distinct': distinct,
+                            'min': low, 'max': high, 'avg': avg, 'top': common}
+        stats = {'rows': rows, 'columns': columns}
+        self.schema.store_stats(table, token, stats)
+        return stats
+
+    def explain(self, query, params=()):
+        """Return the EXPLAIN QUERY PLAN lines for query"""
+        self.c.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in self.c.fetchall()]
+
+    def has_index(self, table, col):
+        """True if some index on table starts with col"""
+        return any(cols[:1] == [col] for cols in self.table_info(table)['indexes'].values())
+
+    @retry_locked
+    def create_index(self, table, col):
+        self.c.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{col}" ON "{table}" ("{col}")')
+        self.commit()
+        self.schema.update(self.conn, table)
+
+    def get_columns(self, table):
+        return list(self.table_info(table)['columns'])
+
+    def get_column_types(self, table):
+        """Map column name to declared type"""
+        return dict(self.table_info(table)['types'])
+
+    def get_tables(self):
+        return self.schema.table_names(self.conn)
+
+    @retry_locked
+    def drop_table(self, table):
+        self.c.execute(f'DROP TABLE IF EXISTS "{FTS_PREFIX}{table}"')
+        self.c.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self.commit()
+        self.schema.update(self.conn, table, exists=False)
+
+    def fts_tables(self):
+        """Names of the tables that have a full-text index"""
+        return self.schema.fts_tables(self.conn)
+
+    def fts_columns(self, table):
+        """Columns a full-text index covers: all but BLOBs and names FTS5 reserves"""
+        return [col for col, dtype in self.get_column_types(table).items()
+                if not is_blob(dtype) and col.lower() not in ('rowid', 'rank')]
+
+    @retry_locked
+    def create_fts(self, table):
+        """Build an FTS5 external-content index of table, kept up to date by triggers"""
+        if self.get_key_columns(table) != ['rowid']:
+            raise ValueError("Full-text search needs a table with a rowid")
+        cols = self.fts_columns(table)
+        if not cols:
+            raise ValueError(f"{table} has no text columns to index")
+        fts = f"{FTS_PREFIX}{table}"
+        col_str = ', '.join(f'"{col}"' for col in cols)
+        new = ', '.join(f'new."{col}"' for col in cols)
+        old = ', '.join(f'old."{col}"' for col in cols)
+        delete = f"""INSERT INTO "{fts}" ("{fts}", rowid, {col_str}) VALUES ('delete', old.rowid, {old});"""
+        insert = f'INSERT INTO "{fts}" (rowid, {col_str}) VALUES (new.rowid, {new});'
+        with self.transaction():
+            self.c.execute(f'CREATE VIRTUAL TABLE "{fts}" USING fts5({col_str}, content="{table}", '
+                           f"content_rowid='rowid', tokenize='{FTS_TOKENIZER}')")
+            self.c.execute(f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN {insert} END')
+            self.c.execute(f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN {delete} END')
+            self.c.execute(f'CREATE TRIGGER "{fts}_au" AFTER UPDATE ON "{table}" BEGIN {delete} {insert} END')
+            self.c.execute(f"""INSERT INTO "{fts}" ("{fts}") VALUES ('rebuild')""")
+        self.schema.invalidate()
+
+    @retry_locked
+    def drop_fts(self, table):
+        with self.transaction():
+            for suffix in ('_ai', '_ad', '_au'):
+                self.c.execute(f'DROP TRIGGER IF EXISTS "{FTS_PREFIX}{table}{suffix}"')
+            self.c.execute(f'DROP TABLE IF EXISTS "{FTS_PREFIX}{table}"')
+        self.schema.invalidate()
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Best full-text matches for text across all indexed tables
+
+        Returns up to limit dicts with table, rowid, score (bm25, lower is
+        better) and a snippet with the matched words in [brackets]. The last
+        word is matched as a prefix, so partial words find results too.
+        """
+        words = re.findall(r'\w+', text)
+        if not words:
+            return []
+        query = ' '.join(f'"{word}"' for word in words) + '*'
+        hits = []
+        for table in sorted(self.fts_tables()):
+            fts = f"{FTS_PREFIX}{table}"
+            self.c.execute(f"""SELECT rowid, bm25("{fts}"), snippet("{fts}", -1, '[', ']', '...', 10) """
+                           f'FROM "{fts}" WHERE "{fts}" MATCH ? ORDER BY rank LIMIT ?', (query, limit))
+            hits += [{'table': table, 'rowid': rowid, 'score': score, 'snippet': snippet}
+                     for rowid, score, snippet in self.c.fetchall()]
+        hits.sort(key=lambda hit: hit['score'])
+        return hits[:limit]
+
+    def export_csv(self, table, path=None, columns=None, where=None, params=(), compress=False,
+                   progress=None, cancel=None, batch_size=EXPORT_BATCH):
+        """Stream table rows to a CSV file in batches, return the row count (None if cancelled)
+
+        BLOB values are written as hex after a \\x marker, which import_csv
+        turns back into BLOBs.
+        """
+        path = path or f"{table}.csv" + ('.gz' if compress else '')
+        types = self.get_column_types(table)
+        columns = columns or list(types)
+        col_str = ', '.join(_blob_field(col) + f' AS "{col}"'
+                            if is_blob(types.get(col, '')) else f'"{col}"' for col in columns)
+        if any(is_blob(types.get(col, '')) for col in columns):
+            batch_size = min(batch_size, EXPORT_BLOB_BATCH)
+        where_str = f" WHERE {where}" if where else ''
+        cur = self.conn.cursor()
+        total = None
+        if progress:
+            cur.execute(f'SELECT count(*) FROM "{table}"{where_str}', params)
+            total = cur.fetchone()[0]
+        cur.execute(f'SELECT {col_str} FROM "{table}"{where_str}', params)
+        opener = gzip.open if compress else open
+        done = 0
+        try:
+            with opener(path, 'wt', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow([desc[0] for desc in cur.description])
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    done += len(rows)
+                    if progress:
+                        progress(done, total)
+        except BaseException:
+            os.remove(path)
+            raise
+        finally:
+            cur.close()
+        if cancel is not None and cancel.is_set():
+            os.remove(path)
+            return None
+        return done
+
+    def import_csv(self, table, path, progress=None, cancel=None, batch_size=IMPORT_BATCH):
+        """Bulk load a CSV file into table, creating it from the header if needed
+
+        Lines with the wrong field count, unconvertible values or values that
+        break a constraint are skipped and listed in the result's 'rejected'.
+        """
+        start = time.perf_counter()
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                raise ValueError("empty CSV file")
+            sample = list(islice(reader, IMPORT_SAMPLE))
+            if table in self.get_tables():
+                types = self.get_column_types(table)
+                missing = [col for col in header if col not in types]
+                if missing:
+                    raise ValueError(f"Unknown columns: {', '.join(missing)}")
+                types = {col: types[col] for col in header}
+            else:
+                types = infer_types(header, sample)
+                self.create_table(table, types)
+            converters = [_converter(dtype) for dtype in types.values()]
+
+            saved = {p: self.conn.execute(f"PRAGMA {p}").fetchone()[0] for p in IMPORT_PRAGMAS}
+            for pragma, value in IMPORT_PRAGMAS.items():
+                self.conn.execute(f"PRAGMA {pragma} = {value}")
+            rows, rejected, batch, lines = 0, [], [], []
+            cancelled = False
+
+            def reject(line, reason):
+                if len(rejected) < IMPORT_MAX_REJECTED:
+                    rejected.append((line, reason))
+
+            def flush():
+                """Insert the batch; if a row breaks a constraint, insert row by row and reject those"""
+                try:
+                    self.insert_many(table, header, batch)
+                    return len(batch)
+                except sql.IntegrityError:
+                    self.conn.rollback()
+                col_str = ', '.join(f'"{col}"' for col in header)
+                insert = f'INSERT INTO "{table}" ({col_str}) VALUES ({", ".join("?" for _ in header)})'
+                inserted = 0
+                with self.transaction():
+                    for line, values in zip(lines, batch):
+                        try:
+                            self.c.execute(insert, values)
+                            inserted += 1
+                        except sql.IntegrityError as e:
+                            reject(line, str(e))
+                return inserted
+
+            try:
+                for line, row in enumerate(chain(sample, reader), start=2):
+                    if len(row) != len(header):
+                        reject(line, f"expected {len(header)} fields, got {len(row)}")
+                    else:
+                        try:
+                            batch.append([None if v == '' else conv(v) for conv, v in zip(converters, row)])
+                            lines.append(line)
+                        except ValueError as e:
+                            reject(line, str(e))
+                    if len(batch) >= batch_size:
+                        if cancel is not None and cancel.is_set():
+                            cancelled = True
+                            break
+                        rows += flush()
+                        batch, lines = [], []
+                        if progress:
+                            progress(rows)
+                if batch and not cancelled:
+                    rows += flush()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                for pragma, value in saved.items():
+                    self.conn.execute(f"PRAGMA {pragma} = {value}")
+        seconds = time.perf_counter() - start
+        return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds else 0,
+                'rejected': rejected, 'cancelled': cancelled}
+
+    def read_blob(self, table, col, rowid, path, chunk=BLOB_CHUNK):
+        """Copy one BLOB cell into a file, chunk bytes at a time; return its size
+
+        Connection.blobopen is new in Python 3.11; before that the value is
+        read in one piece.
+        """
+        if not hasattr(self.conn, 'blobopen'):
+            self.c.execute(f'SELECT "{col}" FROM "{table}" WHERE rowid = ?', (rowid,))
+            row = self.c.fetchone()
+            if row is None:
+                raise ValueError(f"No row {rowid} in {table}")
+            data = row[0] if isinstance(row[0], bytes) else str(row[0] or '').encode()
+            with open(path, 'wb') as f:
+                f.write(data)
+            return len(data)
+        with self.conn.blobopen(table, col, rowid, readonly=True) as blob, open(path, 'wb') as f:
+            while data := blob.read(chunk):
+                f.write(data)
+            return len(blob)
+
+    @retry_locked
+    def write_blob(self, table, col, rowid, path, chunk=BLOB_CHUNK):
+        """Replace one BLOB cell with the content of a file, chunk bytes at a time"""
+        size = os.path.getsize(path)
+        with self.transaction():
+            self.c.execute(f'UPDATE "{table}" SET "{col}" = zeroblob(?) WHERE rowid = ?', (size, rowid))
+            if not self.c.rowcount:
+                raise ValueError(f"No row {rowid} in {table}")
+            if not hasattr(self.conn, 'blobopen'):  # Python < 3.11: write it in one piece
+                with open(path, 'rb') as f:
+                    self.c.execute(f'UPDATE "{table}" SET "{col}" = ? WHERE rowid = ?', (f.read(), rowid))
+                return size
+            with self.conn.blobopen(table, col, rowid) as blob, open(path, 'rb') as f:
+                while data := f.read(chunk):
+                    blob.write(data)
+        return size
+
+    def vacuum(self, auto_vacuum=None):
+        """Rebuild the database file to reclaim free pages, optionally changing auto_vacuum"""
+        if auto_vacuum:
+            self.conn.execute(f"PRAGMA auto_vacuum = {auto_vacuum}")
+        self.conn.execute("VACUUM")
+        # VACUUM may renumber rowids of tables without an INTEGER PRIMARY KEY
+        page_cache.invalidate(self.path)
+        self.schema.invalidate()
+        with self.transaction():  # full-text indexes point at rowids, so rebuild them
+            for table in self.fts_tables():
+                self.c.execute(f"""INSERT INTO "{FTS_PREFIX}{table}" ("{FTS_PREFIX}{table}") VALUES ('rebuild')""")
+
+    def incremental_vacuum(self):
+        """Return free pages to the file system (needs auto_vacuum = INCREMENTAL)"""
+        self.conn.execute("PRAGMA incremental_vacuum").fetchall()
+        self.conn.commit()
+
+    def analyze(self):
+        """Gather statistics for the query planner and for row estimates"""
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+        self.schema.invalidate()
+
+    def optimize(self):
+        self.conn.execute("PRAGMA optimize").fetchall()
+        self.conn.commit()
+
+    def storage_info(self):
+        """File sizes, page usage, fragmentation and storage settings of the database
+
+        fragmentation is the share of table and index pages that don't
+        directly follow the previous page of the same b-tree, unused the share
+        of page bytes holding no data (both None without the dbstat table).
+        """
+        info = {}
+        for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum', 'journal_mode',
+                       'cache_size', 'mmap_size'):
+            row = self.conn.execute(f"PRAGMA {pragma}").fetchone()
+            info[pragma] = row[0] if row else None
+        info['auto_vacuum'] = ('none', 'full', 'incremental')[info['auto_vacuum']]
+        info['file_size'] = os.path.getsize(self.path)
+        wal = self.path + '-wal'
+        info['wal_size'] = os.path.getsize(wal) if os.path.exists(wal) else 0
+        info['profile'] = get_profile(self.path[:-3])
+        try:
+            pages = out_of_order = unused = 0
+            previous = (None, None)
+            for name, pageno, page_unused in self.conn.execute("SELECT name, pageno, unused FROM dbstat"):
+                if name == previous[0] and pageno != previous[1] + 1:
+                    out_of_order += 1
+                previous = (name, pageno)
+                pages += 1
+                unused += page_unused
+            info['fragmentation'] = out_of_order / pages if pages else 0.0
+            info['unused'] = unused / (pages * info['page_size']) if pages else 0.0
+        except sql.OperationalError:
+            info['fragmentation'] = info['unused'] = None
+        return info
+
+    def close(self):
+        """Release the cursor; the pooled connection stays open"""
+        self.c.close()
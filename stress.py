@@ -0,0 +1,115 @@
+"""Multi-process stress test for shared databases.
+
+Starts writer and reader processes against one data database and
+user_management.db in a scratch directory, then reports throughput and
+checks that every acknowledged write made it to disk:
+
+    python stress.py --writers 4 --readers 4 --seconds 10
+    python stress.py --no-wal          # same run with the rollback journal
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+
+import core
+
+
+def setup(directory, wal):
+    core.WAL_MODE = wal
+    os.chdir(directory)
+
+
+def writer(directory, wal, wid, seconds, results):
+    setup(directory, wal)
+    db = core.DB('stress')
+    writes = grants = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            db.insert('events', {'writer': wid, 'seq': writes})
+            writes += 1
+            if writes % 10 == 0:
+                core.add_permission(f"db{wid}", f"user{writes}", f"writer{wid}")
+                grants += 1
+        except core.sql.OperationalError:
+            errors += 1
+    core.pool.close_all()
+    results.put(('writer', wid, writes, grants, errors))
+
+
+def reader(directory, wal, rid, seconds, results):
+    setup(directory, wal)
+    db = core.DB('stress')
+    users = core.pool.get(core.USER_DB)
+    reads = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            db.c.execute("SELECT count(*) FROM events")
+            db.c.fetchone()
+            db.fetch_page('events', limit=100)
+            users.execute("SELECT count(*) FROM permissions").fetchone()
+            reads += 1
+        except core.sql.OperationalError:
+            errors += 1
+    core.pool.close_all()
+    results.put(('reader', rid, reads, 0, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--no-wal', dest='wal', action='store_false', help="use the rollback journal")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='sgbdr-stress-')
+    setup(directory, args.wal)
+    core.init_user_db()
+    core.DB('stress').create_table('events', {'writer': 'INTEGER', 'seq': 'INTEGER'})
+    core.pool.close_all()
+
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(directory, args.wal, i, args.seconds, results))
+             for i in range(args.writers)]
+    procs += [ctx.Process(target=reader, args=(directory, args.wal, i, args.seconds, results))
+              for i in range(args.readers)]
+    for proc in procs:
+        proc.start()
+    reports = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    acked = {wid: writes for kind, wid, writes, _, _ in reports if kind == 'writer'}
+    grants = sum(g for kind, _, _, g, _ in reports if kind == 'writer')
+    reads = sum(n for kind, _, n, _, _ in reports if kind == 'reader')
+    errors = {kind: sum(e for k, _, _, _, e in reports if k == kind) for kind in ('writer', 'reader')}
+
+    conn = core.sql.connect(os.path.join(directory, 'stress.db'))
+    lost = 0
+    for wid, writes in acked.items():
+        seqs = {row[0] for row in conn.execute("SELECT seq FROM events WHERE writer = ?", (wid,))}
+        lost += len(set(range(writes)) - seqs)
+    conn.close()
+    conn = core.sql.connect(os.path.join(directory, core.USER_DB))
+    stored_grants = conn.execute("SELECT count(*) FROM permissions").fetchone()[0]
+    conn.close()
+    shutil.rmtree(directory)
+
+    mode = 'WAL' if args.wal else 'rollback journal'
+    print(f"{mode}: {args.writers} writers, {args.readers} readers, {args.seconds:g}s")
+    print(f"  writes: {sum(acked.values())} ({sum(acked.values()) / args.seconds:.0f}/s), "
+          f"errors: {errors['writer']}")
+    print(f"  reads:  {reads} ({reads / args.seconds:.0f}/s), errors: {errors['reader']}")
+    print(f"  grants: {grants} acknowledged, {stored_grants} stored")
+    print(f"  lost writes: {lost + grants - stored_grants}")
+    return 1 if lost or grants != stored_grants else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
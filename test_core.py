@@ -0,0 +1,200 @@
+"""Tests for the data layer: keyset paging, filters and CSV import/export.
+
+    python -m pytest -q
+
+Each test runs in its own temporary directory, so the repository's databases
+are never touched.
+"""
+import os
+import shutil
+
+import pytest
+
+import core
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = core.DB('test')
+    db.create_table('t', {'v': 'INTEGER', 'name': 'TEXT'})
+    # v has duplicates and NULLs, so paging depends on the rowid tie-breaker
+    db.insert_many('t', ['v', 'name'], [[None if i % 7 == 0 else i % 10, f"row {i}"] for i in range(1, 201)])
+    yield db
+    core.pool.close_all()
+
+
+def expected(db, order=None, desc=False, where='', params=()):
+    direction = 'DESC' if desc else 'ASC'
+    order_by = f'"{order}" {direction}, rowid {direction}' if order else f'rowid {direction}'
+    return db.conn.execute(f"SELECT rowid FROM t {where} ORDER BY {order_by}", params).fetchall()
+
+
+def page_forward(db, limit, **view):
+    size = 2 if view.get('order') else 1
+    rows, after = [], None
+    while True:
+        page = db.fetch_page('t', after=after, limit=limit, **view)
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = tuple(page[-1][:size])
+
+
+def page_backward(db, limit, last, **view):
+    """Page from the row `last` back to the start, returning rows in display order"""
+    size = 2 if view.get('order') else 1
+    rows, before = [last], tuple(last[:size])
+    while True:
+        page = db.fetch_page('t', before=before, limit=limit, **view)
+        rows = page + rows
+        if len(page) < limit:
+            return rows
+        before = tuple(page[0][:size])
+
+
+def keys(rows, view):
+    return [(row[1 if view.get('order') else 0],) for row in rows]
+
+
+@pytest.mark.parametrize('view', [{}, {'order': 'v'}, {'order': 'v', 'desc': True}, {'order': 'name'}])
+@pytest.mark.parametrize('limit', [1, 7, 50, 500])
+def test_paging_visits_every_row_once(db, view, limit):
+    want = expected(db, view.get('order'), view.get('desc', False))
+    forward = page_forward(db, limit, **view)
+    assert keys(forward, view) == want
+    backward = page_backward(db, limit, forward[-1], **view)
+    assert keys(backward, view) == want
+
+
+def test_paging_with_filter(db):
+    where, params = core.filter_clause('v', '>=', '5')
+    view = {'where': where, 'params': params, 'order': 'v', 'desc': True}
+    rows = page_forward(db, 9, **view)
+    assert keys(rows, view) == expected(db, 'v', True, f"WHERE {where}", params)
+    assert all(row[0] >= 5 for row in rows)
+
+
+def test_page_cache_sees_writes(db):
+    first = db.fetch_page('t', limit=5)
+    db.update_many('t', ['rowid'], [((first[0][0],), {'name': 'changed'})])
+    assert db.fetch_page('t', limit=5)[0][-1] == 'changed'
+
+
+def test_filter_escapes_like_wildcards(db):
+    db.insert('t', {'v': 1, 'name': '50%_off'})
+    for op, value, want in [('contains', '%_', ['50%_off']), ('starts with', '50%', ['50%_off']),
+                            ('contains', 'row 19', ['row 19'] + [f"row {i}" for i in range(190, 200)])]:
+        where, params = core.filter_clause('name', op, value)
+        names = [row[0] for row in db.conn.execute(f"SELECT name FROM t WHERE {where} ORDER BY rowid", params)]
+        assert names == want
+
+
+def test_filter_is_empty(db):
+    where, params = core.filter_clause('v', 'is empty', '')
+    count = db.conn.execute(f"SELECT count(*) FROM t WHERE {where}", params).fetchone()[0]
+    assert params == [] and count == 200 // 7
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_export_import_round_trip(db, compress):
+    path = 'out.csv.gz' if compress else 'out.csv'
+    assert db.export_csv('t', path, compress=compress) == 200
+    result = db.import_csv('copy', path)
+    assert result['rows'] == 200 and not result['rejected']
+    assert db.get_column_types('copy') == {'v': 'INTEGER', 'name': 'TEXT'}
+    assert db.fetch_all('copy') == db.fetch_all('t')
+
+
+def test_export_where_and_columns(db):
+    want = db.conn.execute("SELECT count(*) FROM t WHERE v = 3").fetchone()[0]
+    assert db.export_csv('t', 'some.csv', columns=['name'], where="v = ?", params=(3,)) == want
+    with open('some.csv', newline='', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'name' and lines[1] == 'row 3'
+
+
+def test_import_rejects_bad_lines(db):
+    with open('bad.csv', 'w', newline='', encoding='utf-8') as f:
+        f.write("v,name\n1,a\nx,b\n2\n3,c\n")
+    result = db.import_csv('t', 'bad.csv')
+    assert result['rows'] == 2
+    assert [line for line, _ in result['rejected']] == [3, 4]
+
+
+def test_blob_round_trip(db):
+    """BLOBs and text in BLOB and untyped columns survive export and import, into old and new tables"""
+    db.create_table('b', {'data': 'BLOB', 'raw': ''})
+    values = [[b'\x00\x01', b'\xff'], ['1234', '\\x41'], [b'', '0001'], ['\\server', 7], [None, b'\x12\x34']]
+    db.insert_many('b', ['data', 'raw'], values)
+    db.export_csv('b', 'b.csv')
+    db.create_table('b_same', {'data': 'BLOB', 'raw': ''})
+    db.import_csv('b_same', 'b.csv')
+    result = db.import_csv('b_new', 'b.csv')
+    assert not result['rejected']
+    assert db.get_column_types('b_new') == {'data': 'BLOB', 'raw': 'BLOB'}
+    want = [(data, str(raw) if isinstance(raw, int) else raw) for data, raw in values]  # CSV has no types
+    for table in ('b_same', 'b_new'):
+        assert db.fetch_all(table) == want
+
+
+def test_school_round_trip(db):
+    """Codes with leading zeros, like CNE in the example database, stay TEXT"""
+    shutil.copy(os.path.join(HERE, 'school.db'), 'school.db')
+    school = core.DB('school')
+    school.export_csv('etudiants', 'etudiants.csv')
+    result = school.import_csv('copy', 'etudiants.csv')
+    assert result['rows'] == len(school.fetch_all('etudiants')) and not result['rejected']
+    assert school.get_column_types('copy')['CNE'] == 'TEXT'
+    assert school.fetch_all('copy') == school.fetch_all('etudiants')
+
+
+def test_infer_types_is_strict():
+    header = ['zip', 'under', 'nan', 'space', 'int', 'real']
+    sample = [['01000', '1_000', 'nan', ' 5', '-3', '1.5'], ['75001', '2', 'inf', '6', '0', '2e3']]
+    assert core.infer_types(header, sample) == {'zip': 'TEXT', 'under': 'TEXT', 'nan': 'TEXT',
+                                                'space': 'TEXT', 'int': 'INTEGER', 'real': 'REAL'}
+
+
+def test_import_rejects_constraint_violations(db):
+    db.conn.execute("CREATE TABLE k (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+    with open('k.csv', 'w', newline='', encoding='utf-8') as f:
+        f.write("id,name\n1,a\n2,b\n3,c\n1,dup\n4,\n5,e\n6,f\n7,g\n8,h\n")
+    result = db.import_csv('k', 'k.csv', batch_size=4)
+    assert [line for line, _ in result['rejected']] == [5, 6]
+    assert result['rows'] == 7
+    assert [row[0] for row in db.fetch_all('k')] == [1, 2, 3, 5, 6, 7, 8]
+
+
+def test_import_file_named_table(db):
+    with open('sales-2024.csv', 'w', newline='', encoding='utf-8') as f:
+        f.write("region,amount\nnorth,10\n")
+    assert db.import_csv('sales-2024', 'sales-2024.csv')['rows'] == 1
+    assert 'sales-2024' in db.get_tables()
+    db.drop_table('sales-2024')
+    assert 'sales-2024' not in db.get_tables()
+
+
+def test_import_empty_file(db):
+    open('empty.csv', 'w').close()
+    with pytest.raises(ValueError, match="empty CSV file"):
+        db.import_csv('empty', 'empty.csv')
+
+
+def test_no_sorting_by_blob_column(db):
+    db.create_table('files', {'name': 'TEXT', 'data': 'BLOB'})
+    db.insert('files', {'name': 'a', 'data': b'x' * 1000})
+    with pytest.raises(ValueError):
+        db.fetch_page('files', order='data')
+    assert db.fetch_page('files', order='name')[0][2] == 'a'
+
+
+def test_search_after_delete_and_vacuum(db):
+    db.create_fts('t')
+    db.delete_many('t', ['rowid'], [(rowid,) for rowid in range(1, 101)])
+    db.vacuum()
+    hits = db.search('row 150')
+    assert hits and hits[0]['snippet'] == '[row] [150]'
+    assert db.fetch_rows('t', ['rowid'], [(hits[0]['rowid'],)])[0][-1] == 'row 150'